@@ -13,11 +13,6 @@ import itertools
 import numbers
 import re
 import sys
-# Handle different naming of urllib in Python 2/3
-try:
-    import urllib.request as urllib2
-except ImportError:    # pragma: no cover
-    import urllib2
 import json
 from . import util
 
@@ -50,6 +45,14 @@ class __UnknownValue(object):
     __gt__ = __lt__
     __le__ = __ge__ = __eq__
 
+    # Copies (e.g. of a System that references unknown) must keep the
+    # singleton, otherwise they would no longer compare equal to unknown
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
 
 #: A value that isn't known. Note that this is distinct from a value that
 #: is deliberately omitted, which is represented by Python None.
@@ -834,6 +837,12 @@ class Citation(object):
             def enc(s):
                 return s
 
+        # Import urllib only when needed, since it is slow to import
+        # (and pulls in the email and http packages)
+        try:
+            import urllib.request as urllib2
+        except ImportError:    # pragma: no cover
+            import urllib2
         url = ('https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi'
                '?db=pubmed&retmode=json&rettype=abstract&id=%s' % pubmed_id)
         fh = urllib2.urlopen(url)
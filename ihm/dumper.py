@@ -993,12 +993,13 @@ class _AsymIDProvider(object):
 
     def get_next_id(self):
         """Get the next unique ID"""
-        self.index += 1
-        while self.ids[self.index] in self.seen_ids:
-            self.index += 1
         # Note that we don't need to add our own IDs to seen_ids since
         # they are already guaranteed to be unique
-        return self.ids[self.index]
+        while True:
+            self.index += 1
+            asym_id = self.ids[self.index]
+            if asym_id not in self.seen_ids:
+                return asym_id
 
 
 class _StructAsymDumper(Dumper):
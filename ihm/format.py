@@ -83,6 +83,17 @@ class _CifCategoryWriter(object):
         pass
 
 
+def _get_num_rows(columns):
+    """Return the number of rows in the given dict of loop columns,
+       checking that all columns are the same length"""
+    lengths = set(len(col) for col in columns.values())
+    if len(lengths) > 1:
+        raise ValueError("All columns must be the same length (got %s)"
+                         % ", ".join("%s=%d" % (k, len(col))
+                                     for k, col in sorted(columns.items())))
+    return lengths.pop() if lengths else 0
+
+
 class _CifLoopWriter(object):
     def __init__(self, writer, category, keys, line_wrap=True):
         self._line_wrap = line_wrap
@@ -105,6 +116,12 @@ class _CifLoopWriter(object):
             lw.write(kwargs.get(k, None))
         self.writer.fh.write("\n")
 
+    def write_columns(self, **kwargs):
+        _get_num_rows(kwargs)  # check that all columns are the same length
+        keys = list(kwargs.keys())
+        for row in zip(*[kwargs[k] for k in keys]):
+            self.write(**dict(zip(keys, row)))
+
     def __enter__(self):
         return self
 
@@ -176,19 +193,26 @@ class CifWriter(_Writer):
            :param str category: the name of the category
                                 (e.g. "_struct_conf")
            :param list keys: the field keys in that category
-           :return: an object with a single method `write` which takes
+           :return: an object with a method `write` which takes
                     keyword arguments; this can be called any number of
                     times to add entries to the loop. Any field keys in `keys`
                     that are not provided as arguments to `write`, or values
                     that are the Python value `None`, will get the CIF
                     omitted value ('.'), while arguments to `write` that
                     are not present in `keys` will be ignored.
+                    The object also has a `write_columns` method, which
+                    takes keyword arguments that are sequences of values
+                    (all of the same length) and adds multiple entries
+                    at once; this is equivalent to calling `write` for
+                    each entry, but may be more efficient.
 
            For example::
 
                with writer.loop("_struct_conf", ["id", "conf_type_id"]) as l:
                    for i in range(5):
                        l.write(id='HELX_P1%d' % i, conf_type_id='HELX_P')
+                   l.write_columns(id=['HELX_P20', 'HELX_P21'],
+                                   conf_type_id=['HELX_P', 'HELX_P'])
            """
         return _CifLoopWriter(self, category, keys, line_wrap=self._line_wrap)
 
@@ -241,6 +265,9 @@ class CifWriter(_Writer):
 # Acceptable 'whitespace' characters in CIF
 _WHITESPACE = set(" \t")
 
+# Match a run of non-whitespace characters (an unquoted token)
+_UNQUOTED_TOKEN_RE = re.compile(r'[^ \t]+')
+
 
 class CifParserError(Exception):
     """Exception raised for invalid format mmCIF files"""
@@ -477,29 +504,29 @@ class _CifTokenizer(object):
             return strlen
         else:
             # Find end of token (whitespace or end of line)
-            end_pos = start_pos
-            while end_pos < strlen and line[end_pos] not in _WHITESPACE:
-                end_pos += 1
-            val = line[start_pos:end_pos]
-            if val == 'loop_':
-                tok = _LoopToken()
-            elif val.startswith('data_'):
-                tok = _DataToken(val[5:])
-            elif val.startswith('save_'):
-                tok = _SaveToken()
-            elif val.startswith('_'):
-                tok = self._handle_variable_token(val, self._linenum)
-            elif val == '.':
-                tok = _OmittedValueToken()
-            elif val == '?':
-                tok = _UnknownValueToken()
-            else:
-                # Note that we do no special processing for other reserved
-                # words (global_, save_, stop_). But the probability of
-                # them occurring where we expect a value is pretty small.
-                tok = _TextValueToken(val, None)  # don't alter case of values
-            self._tokens.append(tok)
-            return end_pos
+            m = _UNQUOTED_TOKEN_RE.match(line, start_pos)
+            self._tokens.append(self._get_unquoted_token(m.group()))
+            return m.end()
+
+    def _get_unquoted_token(self, val):
+        """Get a :class:`_Token` for the unquoted string `val`"""
+        if val == 'loop_':
+            return _LoopToken()
+        elif val.startswith('data_'):
+            return _DataToken(val[5:])
+        elif val.startswith('save_'):
+            return _SaveToken()
+        elif val.startswith('_'):
+            return self._handle_variable_token(val, self._linenum)
+        elif val == '.':
+            return _OmittedValueToken()
+        elif val == '?':
+            return _UnknownValueToken()
+        else:
+            # Note that we do no special processing for other reserved
+            # words (global_, save_, stop_). But the probability of
+            # them occurring where we expect a value is pretty small.
+            return _TextValueToken(val, None)  # don't alter case of values
 
     def _handle_variable_token(self, val, linenum):
         return _VariableToken(val, linenum)
@@ -508,12 +535,22 @@ class _CifTokenizer(object):
         """Potentially handle a comment that spans line[start_pos:]."""
         pass
 
+    # If True, lines without quotes or comments are split into tokens with
+    # a single regex rather than character by character
+    _split_unquoted = True
+
     def _tokenize(self, line):
         """Break up a line into tokens, populating self._tokens"""
         self._tokens = []
         if line.startswith('#'):
             self._handle_comment(line, 0)
             return  # Skip comment lines
+        if (self._split_unquoted and '"' not in line and "'" not in line
+                and '#' not in line):
+            get_token = self._get_unquoted_token
+            self._tokens = [get_token(val)
+                            for val in _UNQUOTED_TOKEN_RE.findall(line)]
+            return
         start_pos = 0
         strlen = len(line)
         while start_pos < strlen:
@@ -549,6 +586,9 @@ class _CifTokenizer(object):
 class _PreservingCifTokenizer(_CifTokenizer):
     """A tokenizer subclass which preserves comments, case and whitespace"""
 
+    # Whitespace must be preserved, so always tokenize character by character
+    _split_unquoted = False
+
     def _tokenize(self, line):
         _CifTokenizer._tokenize(self, line)
         self._tokens.append(_EndOfLineToken())
@@ -13,6 +13,8 @@ from __future__ import division
 import struct
 import sys
 import inspect
+import itertools
+import warnings
 import ihm.format
 import ihm
 try:
@@ -99,7 +101,7 @@ class _ByteArrayDecoder(_Decoder):
         fmt = self._struct_map[enc['type']]
         sz = len(data) // struct.calcsize(fmt)
         # All data is encoded little-endian in bcif
-        return struct.unpack('<' + fmt * sz, data)
+        return struct.unpack('<%d%s' % (sz, fmt), data)
 
 
 class _IntegerPackingDecoder(_Decoder):
@@ -199,12 +201,28 @@ class BinaryCifReader(ihm.format._Reader):
 
        Use :meth:`read_file` to actually read the file.
        See :class:`ihm.format.CifReader` for a description of the parameters.
+
+       :param int num_threads: The maximum number of threads to use to
+              decode the columns of each category in parallel. This only
+              has an effect if the C-accelerated _format module is available
+              and the platform supports POSIX threads (i.e. not on Windows,
+              where a warning is emitted if this is greater than 1);
+              otherwise columns are decoded serially. Even then, threads
+              are only used for categories containing a large amount of
+              data, since for small categories the overhead of starting
+              threads outweighs any gain. Handlers are always called from
+              the calling thread.
     """
     def __init__(self, fh, category_handler, unknown_category_handler=None,
-                 unknown_keyword_handler=None):
+                 unknown_keyword_handler=None, num_threads=1):
         if _format is not None:
             c_file = _format.ihm_file_new_from_python(fh, True)
             self._c_format = _format.ihm_reader_new(c_file, True)
+            if not _format.ihm_reader_set_num_threads(self._c_format,
+                                                      num_threads):
+                warnings.warn("Threads are not supported on this platform; "
+                              "num_threads is ignored and BinaryCIF columns "
+                              "will be decoded serially", RuntimeWarning)
         self.category_handler = category_handler
         self.unknown_category_handler = unknown_category_handler
         self.unknown_keyword_handler = unknown_keyword_handler
@@ -338,6 +356,16 @@ class _LoopWriter(object):
             val = kwargs.get(k, None)
             self._values[i].append(val)
 
+    def write_columns(self, **kwargs):
+        # Data are stored by column anyway, so just append entire columns
+        num_rows = ihm.format._get_num_rows(kwargs)
+        for i, k in enumerate(self.python_keys):
+            col = kwargs.get(k, None)
+            if col is None:
+                self._values[i].extend([None] * num_rows)
+            else:
+                self._values[i].extend(col)
+
     def __enter__(self):
         return self
 
@@ -365,10 +393,10 @@ class _Encoder(object):
 
 def _get_int_float_type(data):
     """Determine the int/float type of the given data"""
-    # If anything is float, treat everything as single-precision float
-    for d in data:
-        if isinstance(d, float):
-            return _Float32
+    # If anything is float, treat everything as single-precision float.
+    # Check each distinct type (found in C) rather than every element.
+    if any(issubclass(t, float) for t in set(map(type, data))):
+        return _Float32
     # Otherwise, figure out the most appropriate int type
     min_val = min(data)
     max_val = max(data)
@@ -396,9 +424,12 @@ class _ByteArrayEncoder(_Encoder):
     def __call__(self, data):
         ba_type = _get_int_float_type(data)
         encdict = {u'kind': u'ByteArray', u'type': ba_type}
+        if ba_type == _Uint8 and isinstance(data, bytearray):
+            # Already in the right format (e.g. a mask); just copy it
+            return bytes(data), encdict
         fmt = self._struct_map[ba_type]
         # All data is encoded little-endian in bcif
-        return struct.pack('<' + fmt * len(data), *data), encdict
+        return struct.pack('<%d%s' % (len(data), fmt), *data), encdict
 
 
 class _DeltaEncoder(_Encoder):
@@ -466,20 +497,21 @@ class _StringArrayMaskedEncoder(_MaskedEncoder):
     _int_encoders = [_DeltaEncoder(), _RunLengthEncoder(),
                      _ByteArrayEncoder()]
 
+    # Map data type to a function to convert data of that type to str.
+    # bool is mapped to YES/NO strings; any type not listed here is
+    # coerced with str() (which returns str data unchanged)
+    _str_coerce = {bool: ihm.format._Writer._boolmap.__getitem__}
+
     def __call__(self, data, mask):
         seen_substrs = {}  # keys are substrings, values indices
         sorted_substrs = []
         indices = []
+        str_coerce = self._str_coerce
         for i, reals in enumerate(data):
             if mask is not None and mask[i]:
                 indices.append(-1)
             else:
-                s = reals
-                # Map bool to YES/NO strings
-                if isinstance(s, bool):
-                    s = ihm.format._Writer._boolmap[s]
-                else:
-                    s = str(s)  # coerce non-str data to str
+                s = str_coerce.get(type(reals), str)(reals)
                 if s not in seen_substrs:
                     seen_substrs[s] = len(seen_substrs)
                     sorted_substrs.append(s)
@@ -501,12 +533,23 @@ class _StringArrayMaskedEncoder(_MaskedEncoder):
         return data_indices, [enc_dict]
 
 
+def _replace_masked(data, mask, value):
+    """Return a copy of `data` with every masked element replaced by `value`.
+       Most data are unmasked, so rather than testing every element in
+       Python, copy the list and then visit only the masked indices
+       (found by itertools.compress, which loops in C)."""
+    masked_data = list(data)
+    for i in itertools.compress(range(len(mask)), mask):
+        masked_data[i] = value
+    return masked_data
+
+
 class _IntArrayMaskedEncoder(_MaskedEncoder):
     _encoders = [_DeltaEncoder(), _RunLengthEncoder(), _ByteArrayEncoder()]
 
     def __call__(self, data, mask):
         if mask:
-            masked_data = [-1 if m else d for m, d in zip(mask, data)]
+            masked_data = _replace_masked(data, mask, -1)
         else:
             masked_data = data
         encdata, encoders = _encode(masked_data, self._encoders)
@@ -518,25 +561,31 @@ class _FloatArrayMaskedEncoder(_MaskedEncoder):
 
     def __call__(self, data, mask):
         if mask:
-            masked_data = [0. if m else d for m, d in zip(mask, data)]
+            masked_data = _replace_masked(data, mask, 0.)
         else:
             masked_data = data
         encdata, encoders = _encode(masked_data, self._encoders)
         return encdata, encoders
 
 
+_NoneType = type(None)
+_UnknownType = type(ihm.unknown)
+
+
 def _get_mask_and_type(data):
     """Detect missing/omitted values in `data` and determine the type of
        the remaining values (str, int, float)"""
     mask = None
-    seen_types = set()
-    for i, val in enumerate(data):
-        if val is None or val == ihm.unknown:
-            if mask is None:
-                mask = [0] * len(data)
-            mask[i] = 1 if val is None else 2
-        else:
-            seen_types.add(type(val))
+    # Find all types in C; only build the mask (in Python) if needed.
+    # None and unknown are singletons, so compare by identity.
+    seen_types = set(map(type, data))
+    if _NoneType in seen_types or _UnknownType in seen_types:
+        seen_types.discard(_NoneType)
+        seen_types.discard(_UnknownType)
+        unknown = ihm.unknown
+        # Store the mask compactly (one byte per value)
+        mask = bytearray([1 if val is None else 2 if val is unknown else 0
+                          for val in data])
     # If a mix of types, coerce to that of the highest precedence
     # (mixed int/float can be represented as float; mix int/float/str can
     # be represented as str; bool is represented as str)
@@ -561,7 +610,11 @@ def _get_mask_and_type(data):
 class BinaryCifWriter(ihm.format._Writer):
     """Write information to a BinaryCIF file. See :class:`ihm.format.CifWriter`
        for more information. The constructor takes a single argument - a Python
-       filelike object, open for writing in binary mode."""
+       filelike object, open for writing in binary mode.
+
+       Unlike mmCIF, BinaryCIF cannot be written incrementally; all data
+       (in encoded form) are kept in memory until :meth:`flush` is called.
+    """
 
     _mask_encoders = [_DeltaEncoder(), _RunLengthEncoder(),
                       _ByteArrayEncoder()]
@@ -569,6 +622,7 @@ class BinaryCifWriter(ihm.format._Writer):
     def __init__(self, fh):
         super(BinaryCifWriter, self).__init__(fh)
         self._blocks = []
+        self._categories = None
         self._masked_encoder = {str: _StringArrayMaskedEncoder(),
                                 int: _IntArrayMaskedEncoder(),
                                 float: _FloatArrayMaskedEncoder()}
@@ -615,6 +669,9 @@ class BinaryCifWriter(ihm.format._Writer):
         pass
 
     def _add_category(self, category, data):
+        if self._categories is None:
+            raise ValueError("Cannot write category %s outside of a data "
+                             "block; call start_block() first" % category)
         row_count = 0
         cols = []
         for k, v in data.items():
@@ -627,12 +684,51 @@ class BinaryCifWriter(ihm.format._Writer):
                                  u'columns': cols, u'rowCount': row_count})
 
     def flush(self):
+        """Write all data blocks to the file.
+
+           The data blocks are discarded once they have been written, so
+           :meth:`start_block` must be called again before any more data
+           can be written (writing a category outside of a data block
+           raises ValueError)."""
         data = {u'version': _encode_str(ihm.__version__),
                 u'encoder': u'python-ihm library',
                 u'dataBlocks': self._blocks}
         self._write_msgpack(data)
 
     def _write_msgpack(self, data):
-        """Read the msgpack data from the file and return data blocks"""
+        """Write the data to the file in msgpack format.
+           Rather than packing the entire file into a single bytes object,
+           the containers at the top of the hierarchy (the file, data blocks,
+           and list of categories) are written piecemeal, and each category
+           is written and then released as soon as it has been packed.
+           (The encoded categories themselves are still all held in memory
+           until this point.)"""
         import msgpack
-        msgpack.pack(data, self.fh, use_bin_type=True)
+        packer = msgpack.Packer(use_bin_type=True)
+        fh = self.fh
+
+        def write_map(d, streamed_key, write_streamed):
+            fh.write(packer.pack_map_header(len(d)))
+            for key, value in d.items():
+                fh.write(packer.pack(key))
+                if key == streamed_key:
+                    write_streamed(value)
+                else:
+                    fh.write(packer.pack(value))
+
+        def write_categories(categories):
+            fh.write(packer.pack_array_header(len(categories)))
+            for i in range(len(categories)):
+                fh.write(packer.pack(categories[i]))
+                categories[i] = None
+
+        def write_blocks(blocks):
+            fh.write(packer.pack_array_header(len(blocks)))
+            for block in blocks:
+                write_map(block, u'categories', write_categories)
+
+        write_map(data, u'dataBlocks', write_blocks)
+        # All blocks have been written (and their categories released), so
+        # a new block must be started before any more data can be written
+        self._blocks = []
+        self._categories = None
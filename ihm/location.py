@@ -224,9 +224,14 @@ class FileLocation(Location):
             # Cannot determine file size if non-local
             self.file_size = None
         else:
-            if not os.path.exists(path):
+            try:
+                self.file_size = os.stat(path).st_size
+            except OSError:
+                self.file_size = None
+            # Raise outside of the except block so that the OSError is not
+            # chained to the ValueError (Python 2 has no "raise ... from")
+            if self.file_size is None:
                 raise ValueError("%s does not exist" % path)
-            self.file_size = os.stat(path).st_size
             # Store absolute path in case the working directory changes later
             self.path = os.path.abspath(path)
 
@@ -27,6 +27,17 @@ import warnings
 import sys
 import re
 import collections
+import os
+import time
+import copy
+import functools
+import tempfile
+import threading
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 # Handle different naming of urllib in Python 2/3
 try:
@@ -89,6 +100,65 @@ def _handle_modeller_template(info, template_path_map, target_dataset,
                 alignment_file=alnfile))
 
 
+# Results of recent parse_file calls, keyed by parser class, file path,
+# modification time and size, if enabled (see set_parse_cache)
+_parse_cache = collections.OrderedDict()
+_parse_cache_enabled = False
+_PARSE_CACHE_SIZE = 128
+
+
+def set_parse_cache(enabled=True):
+    """Cache metadata extracted from files.
+
+       Once this function is called, parsers such as :class:`PDBParser`
+       remember the metadata extracted from recently-parsed files, so
+       that parsing the same unmodified file again is fast. Only the
+       modification time and size of the file itself are checked, so
+       changes to any other files it references (such as the alignment
+       and script files named in MODELLER headers) are not noticed.
+       The cache is disabled by default.
+
+       :param bool enabled: If `False`, disable the cache and discard
+              all cached metadata.
+    """
+    global _parse_cache_enabled
+    _parse_cache_enabled = enabled
+    if not enabled:
+        _parse_cache.clear()
+
+
+def clear_parse_cache():
+    """Clear the cache of metadata extracted from files.
+
+       This discards all metadata cached since :func:`set_parse_cache`
+       was called, but leaves the cache enabled.
+    """
+    _parse_cache.clear()
+
+
+def _cached_parse(parse_file):
+    """Decorator to cache the results of a Parser.parse_file method.
+       Each cache hit returns a fresh copy of the metadata, since callers
+       are free to modify it."""
+    @functools.wraps(parse_file)
+    def wrapper(self, filename):
+        if not _parse_cache_enabled:
+            return parse_file(self, filename)
+        fullpath = os.path.abspath(filename)
+        st = os.stat(fullpath)
+        key = (type(self), fullpath,
+               getattr(st, 'st_mtime_ns', st.st_mtime), st.st_size)
+        ret = _parse_cache.pop(key, None)
+        if ret is None:
+            ret = parse_file(self, filename)
+            if len(_parse_cache) >= _PARSE_CACHE_SIZE:
+                _parse_cache.popitem(last=False)
+        # Most recently used entries go to the end
+        _parse_cache[key] = ret
+        return copy.deepcopy(ret)
+    return wrapper
+
+
 class Parser(object):
     """Base class for all metadata parsers."""
 
@@ -101,8 +171,29 @@ class Parser(object):
         pass
 
 
+# Layout of the MRC file header (see
+# https://www.ccpem.ac.uk/mrc_format/mrc2014.php)
+_MRC_HEADER_SIZE = 1024
+_MRC_NLABL_OFFSET = 220
+_MRC_LABEL_OFFSET = 224
+_MRC_LABEL_SIZE = 80
+_MRC_MAX_LABELS = 10
+
+# MRC label that identifies the map as an EMDB entry
+_EMDB_LABEL_RE = re.compile(b'EMDATABANK\\.org.*(EMD\\-\\d+)')
+
+
 class MRCParser(Parser):
-    """Extract metadata from an EM density map (MRC file)."""
+    """Extract metadata from an EM density map (MRC file).
+
+       :param bool prefetch: if True, when an EMDB entry is found, start
+              querying the EMDB web API for its metadata in a background
+              thread, so that it is likely to be available by the time
+              it is needed.
+    """
+
+    def __init__(self, prefetch=False):
+        self.prefetch = prefetch
 
     def parse_file(self, filename):
         """Extract metadata. See :meth:`Parser.parse_file` for details.
@@ -117,6 +208,8 @@ class MRCParser(Parser):
         """
         emdb = self._get_emdb(filename)
         if emdb:
+            if self.prefetch:
+                _prefetch_emdb_info(emdb)
             loc = _ParsedEMDBLocation(emdb)
         else:
             loc = location.InputFileLocation(
@@ -125,24 +218,264 @@ class MRCParser(Parser):
 
     def _get_emdb(self, filename):
         """Return the EMDB id of the file, or None."""
-        r = re.compile(b'EMDATABANK\\.org.*(EMD\\-\\d+)')
-        with open(filename, 'rb') as fh:
-            fh.seek(220)  # Offset of number of labels
-            num_labels_raw = fh.read(4)
-            # Number of labels in MRC is usually a very small number, so it's
-            # very likely to be the smaller of the big-endian and little-endian
-            # interpretations of this field
-            num_labels_big, = struct.unpack_from('>i', num_labels_raw)
-            num_labels_little, = struct.unpack_from('<i', num_labels_raw)
-            num_labels = min(num_labels_big, num_labels_little)
-            for i in range(num_labels):
-                label = fh.read(80).strip()
-                m = r.search(label)
-                if m:
-                    if sys.version_info[0] < 3:    # pragma: no cover
-                        return m.group(1)
-                    else:
-                        return m.group(1).decode('ascii')
+        r = _EMDB_LABEL_RE
+        # Read the entire fixed-size header (which includes all labels)
+        # in one go. The file is unbuffered since we only want the header,
+        # not the map data that follows it.
+        with open(filename, 'rb', buffering=0) as fh:
+            header = fh.read(_MRC_HEADER_SIZE)
+        # Number of labels in MRC is usually a very small number, so it's
+        # very likely to be the smaller of the big-endian and little-endian
+        # interpretations of this field
+        num_labels_big, = struct.unpack_from('>i', header, _MRC_NLABL_OFFSET)
+        num_labels_little, = struct.unpack_from('<i', header,
+                                                _MRC_NLABL_OFFSET)
+        num_labels = min(num_labels_big, num_labels_little,
+                         _MRC_MAX_LABELS)
+        for i in range(num_labels):
+            offset = _MRC_LABEL_OFFSET + i * _MRC_LABEL_SIZE
+            label = header[offset:offset + _MRC_LABEL_SIZE].strip()
+            m = r.search(label)
+            if m:
+                if sys.version_info[0] < 3:    # pragma: no cover
+                    return m.group(1)
+                else:
+                    return m.group(1).decode('ascii')
+
+
+# Metadata (version, details) for recently-used EMDB entries, keyed by
+# access code, if caching is enabled (see set_emdb_cache)
+_emdb_info_cache = collections.OrderedDict()
+_emdb_cache_enabled = False
+_EMDB_CACHE_SIZE = 128
+
+# On-disk cache of EMDB metadata, if enabled (see set_emdb_cache)
+_emdb_disk_cache = None
+
+# Background fetches of EMDB metadata (_EMDBFetch objects), keyed by
+# access code
+_emdb_prefetch = {}
+
+# Guards _emdb_info_cache and _emdb_prefetch, which are also modified by
+# background threads
+_emdb_lock = threading.Lock()
+
+# EMDB API endpoint for entry metadata (release date, title)
+_EMDB_API_URL = 'https://www.ebi.ac.uk/emdb/api/entry/admin/%s'
+
+
+def _get_default_cache_dir():
+    """Get the directory to store python-ihm cache files in."""
+    return os.path.join(os.environ.get('XDG_CACHE_HOME')
+                        or os.path.join(os.path.expanduser('~'), '.cache'),
+                        'python-ihm')
+
+
+class _EMDBMetadataCache(object):
+    """Cache of EMDB metadata (version, details), stored on disk as a JSON
+       file. Entries older than `max_age` seconds are considered stale."""
+    def __init__(self, filename, max_age):
+        self.filename, self.max_age = filename, max_age
+        self._lock = threading.Lock()
+        try:
+            with open(filename) as fh:
+                self._entries = json.load(fh)
+        except (IOError, ValueError):
+            self._entries = {}
+
+    def get(self, access_code):
+        """Return (info, stale) for the given entry, or (None, None)
+           if it is not in the cache."""
+        with self._lock:
+            entry = self._entries.get(access_code)
+        if entry is None:
+            return None, None
+        info = (entry['map_release'], entry['title'])
+        return info, time.time() - entry['fetched_at'] > self.max_age
+
+    def set(self, access_code, info):
+        """Add or update an entry in the cache, and write it to disk"""
+        with self._lock:
+            self._entries[access_code] = {
+                'map_release': info[0], 'title': info[1],
+                'fetched_at': time.time()}
+            self._write()
+
+    def _write(self):
+        # Write to a temporary file and then move it into place, so that
+        # the cache file is never seen in a partially-written state
+        dirname = os.path.dirname(os.path.abspath(self.filename))
+        try:
+            if not os.path.exists(dirname):
+                os.makedirs(dirname)
+            fd, tmpname = tempfile.mkstemp(dir=dirname)
+            with os.fdopen(fd, 'w') as fh:
+                json.dump(self._entries, fh)
+            getattr(os, 'replace', os.rename)(tmpname, self.filename)
+        except (IOError, OSError) as err:
+            warnings.warn("Could not write EMDB metadata cache %s: %s"
+                          % (self.filename, str(err)))
+
+
+def set_emdb_cache(filename=None, max_age=3 * 86400, persist=True):
+    """Cache metadata retrieved from EMDB.
+
+       By default, :class:`MRCParser` queries the EMDB web API every time
+       the metadata for an EMDB entry is needed. Once this function is
+       called, the metadata for recently-used entries is kept in memory,
+       so that each entry is queried only once for the rest of the
+       session (use :func:`clear_emdb_cache` to force a new query).
+       The metadata is also stored in a JSON file so that it can be reused
+       in later sessions. Cached metadata in this file older than
+       `max_age` seconds is still used, but is refreshed from EMDB in
+       the background.
+
+       :param str filename: Name of the JSON cache file. If not given,
+              `python-ihm/emdb.json` in the user's cache directory
+              (``$XDG_CACHE_HOME`` or ``~/.cache``) is used. If `False`,
+              all caching is disabled and cached metadata is discarded.
+       :param int max_age: Time, in seconds, after which metadata in the
+              JSON cache file is considered stale.
+       :param bool persist: If `False`, only cache metadata in memory;
+              no JSON file is used.
+    """
+    global _emdb_disk_cache, _emdb_cache_enabled
+    if filename is False:
+        _emdb_disk_cache = None
+        _emdb_cache_enabled = False
+        with _emdb_lock:
+            _emdb_info_cache.clear()
+        return
+    _emdb_cache_enabled = True
+    if not persist:
+        _emdb_disk_cache = None
+        return
+    if filename is None:
+        filename = os.path.join(_get_default_cache_dir(), 'emdb.json')
+    _emdb_disk_cache = _EMDBMetadataCache(filename, max_age)
+
+
+def _get_cached_emdb_info(access_code):
+    """Get cached metadata for the given EMDB entry, or None"""
+    with _emdb_lock:
+        info = _emdb_info_cache.pop(access_code, None)
+        if info is not None:
+            # Most recently used entries go to the end
+            _emdb_info_cache[access_code] = info
+    return info
+
+
+def _set_cached_emdb_info(access_code, info):
+    """Cache metadata for the given EMDB entry, if caching is enabled"""
+    if not _emdb_cache_enabled:
+        return
+    with _emdb_lock:
+        _emdb_info_cache.pop(access_code, None)
+        if len(_emdb_info_cache) >= _EMDB_CACHE_SIZE:
+            _emdb_info_cache.popitem(last=False)
+        _emdb_info_cache[access_code] = info
+
+
+def clear_emdb_cache():
+    """Clear the in-memory cache of metadata retrieved from EMDB.
+
+       Subsequent lookups will use the disk cache (see
+       :func:`set_emdb_cache`), if enabled, or query the EMDB web API
+       again. Any prefetches still in progress are forgotten.
+    """
+    with _emdb_lock:
+        _emdb_info_cache.clear()
+        _emdb_prefetch.clear()
+
+
+def _fetch_emdb_info(access_code):
+    """Query EMDB API and return (version, details) of a given entry.
+       A URLError is raised on failure, ValueError if the response is not
+       valid JSON, or KeyError if it lacks the required fields."""
+    req = urllib.request.Request(_EMDB_API_URL % access_code, None, {})
+    response = urllib.request.urlopen(req, timeout=10)
+    version, details = _parse_emdb_response(response)
+    # JSON values are always Unicode, but on Python 2 we want non-Unicode
+    # strings, so convert to ASCII
+    if sys.version_info[0] < 3:    # pragma: no cover
+        return (version.encode('ascii'), details.encode('ascii'))
+    else:
+        return (version, details)
+
+
+def _parse_emdb_response(response):
+    """Extract the release date and title from an EMDB API response."""
+    if ijson is None:
+        # Parse the complete response in one go
+        info = json.loads(response.read())['admin']
+        return info['key_dates']['map_release'], info['title']
+    # If ijson is available, stream the response and stop reading as soon
+    # as we have the two fields we need
+    fields = {}
+    error = None
+    try:
+        for prefix, event, value in ijson.parse(response):
+            if prefix in ('admin.key_dates.map_release', 'admin.title'):
+                fields[prefix] = value
+                if len(fields) == 2:
+                    break
+    except ijson.JSONError as err:
+        error = str(err)
+    # Report malformed JSON as ValueError, just like json.loads. Raise
+    # outside of the except block so the ijson error is not chained to it.
+    if error is not None:
+        raise ValueError("Invalid EMDB API response: %s" % error)
+    # Missing fields raise KeyError, just like the json.loads path above
+    return fields['admin.key_dates.map_release'], fields['admin.title']
+
+
+class _EMDBFetch(object):
+    """Query of the EMDB API for metadata, run in a background thread.
+       Once the thread finishes, either `info` is set to the metadata, or
+       `error` to the exception raised by the query, so that whoever needs
+       the metadata can handle it."""
+    def __init__(self, access_code, disk_cache):
+        self.info = self.error = None
+        self.thread = threading.Thread(target=self._run,
+                                       args=(access_code, disk_cache))
+        self.thread.daemon = True
+
+    def _run(self, access_code, disk_cache):
+        try:
+            info = _fetch_emdb_info(access_code)
+        except (urllib.error.URLError, KeyError, ValueError) as err:
+            self.error = err
+            return
+        _set_cached_emdb_info(access_code, info)
+        if disk_cache is not None:
+            disk_cache.set(access_code, info)
+        self.info = info
+
+
+def _start_emdb_refresh(access_code, disk_cache):
+    """Start fetching EMDB metadata in a background thread"""
+    with _emdb_lock:
+        if access_code in _emdb_prefetch:
+            return
+        fetch = _EMDBFetch(access_code, disk_cache)
+        _emdb_prefetch[access_code] = fetch
+    fetch.thread.start()
+
+
+def _prefetch_emdb_info(access_code):
+    """Start fetching EMDB metadata in the background, if needed"""
+    # Forget about any earlier fetches that have already finished
+    with _emdb_lock:
+        for code, fetch in list(_emdb_prefetch.items()):
+            if not fetch.thread.is_alive():
+                del _emdb_prefetch[code]
+    if _get_cached_emdb_info(access_code) is not None:
+        return
+    if _emdb_disk_cache is not None:
+        info, stale = _emdb_disk_cache.get(access_code)
+        if info is not None and not stale:
+            return
+    _start_emdb_refresh(access_code, _emdb_disk_cache)
 
 
 class _ParsedEMDBLocation(location.EMDBLocation):
@@ -176,39 +509,68 @@ class _ParsedEMDBLocation(location.EMDBLocation):
         """Query EMDB API and get version & details of a given entry"""
         if self.__emdb_info is not None:
             return
-        req = urllib.request.Request(
-            'https://www.ebi.ac.uk/emdb/api/entry/admin/%s'
-            % self.access_code, None, {})
+        info = _get_cached_emdb_info(self.access_code)
+        if info is not None:
+            self.__emdb_info = list(info)
+            return
+        disk_cache = _emdb_disk_cache
+        if disk_cache is not None:
+            info, stale = disk_cache.get(self.access_code)
+            if info is not None:
+                _set_cached_emdb_info(self.access_code, info)
+                self.__emdb_info = list(info)
+                # Serve stale data immediately, and refresh in the background
+                if stale:
+                    _start_emdb_refresh(self.access_code, disk_cache)
+                return
+        # Wait for any prefetch of this entry to finish, and use its result
+        with _emdb_lock:
+            fetch = _emdb_prefetch.pop(self.access_code, None)
         try:
-            response = urllib.request.urlopen(req, timeout=10)
+            if fetch is not None:
+                fetch.thread.join()
+                if fetch.error is not None:
+                    raise fetch.error
+                info = fetch.info
+            else:
+                info = _fetch_emdb_info(self.access_code)
         except urllib.error.URLError as err:
             warnings.warn("EMDB API query failed; using default metadata "
                           "for MRC file; %s" % str(err))
             self.__emdb_info = [None, None]
             return
-        contents = json.load(response)
-        info = contents['admin']
-        # JSON values are always Unicode, but on Python 2 we want non-Unicode
-        # strings, so convert to ASCII
-        if sys.version_info[0] < 3:    # pragma: no cover
-            self.__emdb_info = [
-                info['key_dates']['map_release'].encode('ascii'),
-                info['title'].encode('ascii')]
-        else:
-            self.__emdb_info = [info['key_dates']['map_release'],
-                                info['title']]
+        if fetch is None:
+            _set_cached_emdb_info(self.access_code, info)
+            if disk_cache is not None:
+                disk_cache.set(self.access_code, info)
+        self.__emdb_info = list(info)
 
     version = property(__get_version, __set_version)
     details = property(__get_details, __set_details)
 
 
+# PDB records that mark the start of the coordinate section. All of the
+# header records we're interested in come before these, so there is no need
+# to read the (potentially very large) rest of the file.
+_PDB_COORD_RECORDS = ('ATOM', 'HETATM', 'MODEL ')
+
+# Headers added to PDB files by MODELLER
+_MODELLER_ALNFILE_RE = re.compile(r'REMARK   6 ALIGNMENT: (\S+)')
+_MODELLER_SCRIPT_RE = re.compile(r'REMARK   6 SCRIPT: (\S+)')
+_MODELLER_TEMPLATE_PATH_RE = re.compile(
+    r'REMARK   6 TEMPLATE PATH (\S+) (\S+)')
+_MODELLER_TEMPLATE_RE = re.compile(
+    r'REMARK   6 TEMPLATE: (\S+) (\S+):(\S+) \- (\S+):\S+ '
+    r'MODELS (\S+):(\S+) \- (\S+):\S+ AT (\S+)%')
+
+
 def _get_swiss_model_metadata(filename):
     """Extract and return metadata from SWISS-MODEL PDB REMARK headers"""
     meta = {}
     with open(filename) as fh:
         in_header = None
         for line in fh:
-            if line.startswith('ATOM'):
+            if line.startswith(_PDB_COORD_RECORDS):
                 break
             if line.startswith('REMARK   3 '):
                 if line.startswith('REMARK   3 MODEL INFORMATION'):
@@ -241,23 +603,22 @@ def _get_aligned_region(tgt_seq, tmpl_seq):
     """Given two primary sequences, return the range of each that is
        aligned (i.e. from the first aligned residue in both sequences to
        the last)"""
-    first = True
-    tgt_pos = 0
-    tmpl_pos = 0
-    start_align = end_align = None
-    for tgt, tmpl in zip(tgt_seq, tmpl_seq):
-        if tgt != '-':
-            tgt_pos += 1
-        if tmpl != '-':
-            tmpl_pos += 1
-            if tgt != '-':
-                end_align = (tgt_pos, tmpl_pos)
-                if first:
-                    start_align = end_align
-                    first = False
-    if first:
+    def is_aligned(i):
+        return tgt_seq[i] != '-' and tmpl_seq[i] != '-'
+
+    def seq_pos(seq, i):
+        # Number of residues (not gaps) up to and including alignment pos i
+        return i + 1 - seq.count('-', 0, i + 1)
+
+    # Only the first and last aligned positions are needed, so search in
+    # from each end rather than walking the whole alignment
+    alnlen = min(len(tgt_seq), len(tmpl_seq))
+    start = next((i for i in range(alnlen) if is_aligned(i)), None)
+    if start is None:
         raise ValueError("Cannot parse empty alignment")
-    return (start_align[0], end_align[0]), (start_align[1], end_align[1])
+    end = next(i for i in range(alnlen - 1, start - 1, -1) if is_aligned(i))
+    return ((seq_pos(tgt_seq, start), seq_pos(tgt_seq, end)),
+            (seq_pos(tmpl_seq, start), seq_pos(tmpl_seq, end)))
 
 
 class PDBParser(Parser):
@@ -271,6 +632,7 @@ class PDBParser(Parser):
        or :class:`BinaryCIFParser` for BinaryCIF format.
     """
 
+    @_cached_parse
     def parse_file(self, filename):
         """Extract metadata. See :meth:`Parser.parse_file` for details.
 
@@ -492,7 +854,11 @@ class PDBParser(Parser):
     def _parse_unknown_model(self, fh, first_line, local_file, filename, ret):
         # todo: revisit assumption that all unknown source PDBs are
         # comparative models
-        self._handle_comparative_model(local_file, filename, ret)
+        if first_line.startswith(_PDB_COORD_RECORDS):
+            # No headers at all, so no need to look for templates
+            ret['dataset'] = dataset.ComparativeModelDataset(local_file)
+        else:
+            self._handle_comparative_model(local_file, filename, ret)
 
     def _handle_comparative_model(self, local_file, pdbname, ret):
         d = dataset.ComparativeModelDataset(local_file)
@@ -504,18 +870,19 @@ class PDBParser(Parser):
         template_path_map = {}
         alnfile = None
         script = None
-        alnfilere = re.compile(r'REMARK   6 ALIGNMENT: (\S+)')
-        scriptre = re.compile(r'REMARK   6 SCRIPT: (\S+)')
-        tmppathre = re.compile(r'REMARK   6 TEMPLATE PATH (\S+) (\S+)')
-        tmpre = re.compile(r'REMARK   6 TEMPLATE: '
-                           r'(\S+) (\S+):(\S+) \- (\S+):\S+ '
-                           r'MODELS (\S+):(\S+) \- (\S+):\S+ AT (\S+)%')
+        alnfilere = _MODELLER_ALNFILE_RE
+        scriptre = _MODELLER_SCRIPT_RE
+        tmppathre = _MODELLER_TEMPLATE_PATH_RE
+        tmpre = _MODELLER_TEMPLATE_RE
         template_info = []
 
         with open(pdbname) as fh:
             for line in fh:
-                if line.startswith('ATOM'):  # Read only the header
+                # Read only the header
+                if line.startswith(_PDB_COORD_RECORDS):
                     break
+                if not line.startswith('REMARK   6 '):
+                    continue
                 m = tmppathre.match(line)
                 if m:
                     template_path_map[m.group(1)] = \
@@ -562,7 +929,9 @@ class PDBParser(Parser):
         compnd = ''
         source = ''
         for line in fh:
-            if line.startswith('TITLE'):
+            if line.startswith(_PDB_COORD_RECORDS):
+                break
+            elif line.startswith('TITLE'):
                 details += line[10:].rstrip()
             elif line.startswith('COMPND'):
                 compnd += line[10:].rstrip()
@@ -630,7 +999,7 @@ class PDBParser(Parser):
         for line in fh:
             if line.startswith('TITLE'):
                 details += line[10:].rstrip()
-            elif line.startswith('ATOM'):
+            elif line.startswith(_PDB_COORD_RECORDS):
                 break
         return details
 
@@ -893,6 +1262,7 @@ class _CIFParserBase(Parser):
                              dataset.DeNovoModelDataset),
              'MODBASE': (_ModBaseLocation, dataset.ComparativeModelDataset)}
 
+    @_cached_parse
     def parse_file(self, filename):
         m = {'db': {}, 'title': 'Starting model structure',
              'software': [], 'templates': [], 'alignments': []}
@@ -89,6 +89,10 @@ class MultiStateScheme(object):
         if state is None:
             return
         for tmp_state in self._states:
+            # The same object is trivially already present; this is the
+            # common case, and avoids the more expensive comparisons below
+            if tmp_state is state:
+                return
             # Check whether both states have the name attributes
             if hasattr(state, 'name') and hasattr(tmp_state, 'name'):
                 # compare the properties of the two states and the elements of
@@ -130,11 +134,10 @@ class MultiStateScheme(object):
         return self._states
 
     def __eq__(self, other):
-        return ((self.__dict__ == other.__dict__)
-                and (self._connectivity_list ==
-                     other._connectivity_list)
-                and (self._relaxation_time_list ==
-                     other._relaxation_time_list))
+        if self is other:
+            return True
+        # The connectivity and relaxation time lists are part of __dict__
+        return self.__dict__ == other.__dict__
 
 
 class Connectivity(object):
@@ -175,6 +178,8 @@ class Connectivity(object):
         self._assigned_to_scheme = True
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return self.__dict__ == other.__dict__
 
 
@@ -211,6 +216,8 @@ class KineticRate(object):
         self.external_file = file
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return self.__dict__ == other.__dict__
 
 
@@ -276,6 +283,8 @@ class RelaxationTime(object):
         self.external_file = file
 
     def __eq__(self, other):
+        if self is other:
+            return True
         return self.__dict__ == other.__dict__
 
     # Check whether the given unit is within the allowed options
@@ -132,8 +132,10 @@ class IDMapper(object):
            of that class (this is commonly used when different subclasses
            are employed depending on a type specified in the mmCIF file, such
            as the various subclasses of :class:`ihm.dataset.Dataset`)."""
-        if objid in self._obj_by_id:
-            obj = self._obj_by_id[objid]
+        # Most lookups are for objects we have already seen, so do a
+        # single dict lookup (stored objects are never None)
+        obj = self._obj_by_id.get(objid)
+        if obj is not None:
             self._update_old_object(obj, newcls)
             return obj
         else:
@@ -3920,7 +3922,7 @@ def read(fh, model_class=ihm.model.Model, format='mmCIF', handlers=[],
          read_starting_model_coord=True,
          starting_model_class=ihm.startmodel.StartingModel,
          reject_old_file=False, variant=IHMVariant,
-         add_to_system=None):
+         add_to_system=None, num_threads=1):
     """Read data from the file handle `fh`.
 
        Note that the reader currently expects to see a file compliant
@@ -4002,6 +4004,10 @@ def read(fh, model_class=ihm.model.Model, format='mmCIF', handlers=[],
               where the data are split between multiple files) so cannot be
               used to combine two disparate mmCIF files into one.
        :type add_to_system: :class:`ihm.System`
+       :param int num_threads: For BinaryCIF files, the maximum number of
+              threads to use to decode large categories. See
+              :class:`ihm.format_bcif.BinaryCifReader`. This is ignored
+              for mmCIF files.
        :return: A list of :class:`ihm.System` objects.
     """
     if isinstance(variant, type):
@@ -4013,8 +4019,11 @@ def read(fh, model_class=ihm.model.Model, format='mmCIF', handlers=[],
     uchandler = _UnknownCategoryHandler() if warn_unknown_category else None
     ukhandler = _UnknownKeywordHandler() if warn_unknown_keyword else None
 
+    reader_args = {}
+    if format == 'BCIF':
+        reader_args['num_threads'] = num_threads
     r = reader_map[format](fh, {}, unknown_category_handler=uchandler,
-                           unknown_keyword_handler=ukhandler)
+                           unknown_keyword_handler=ukhandler, **reader_args)
     while True:
         if add_to_system:
             s = variant.system_reader(model_class, starting_model_class,
@@ -126,9 +126,12 @@ def combine_entities(s, other_s):
     entity_map = {}
     sequences = dict((e.sequence, e) for e in s.entities)
     for e in other_s.entities:
-        if e.sequence in sequences:
+        # Look up each sequence only once, since hashing it calls
+        # ChemComp.__hash__ for every residue
+        existing = sequences.get(e.sequence)
+        if existing is not None:
             # If the `other_s` Entity already exists in `s`, map to it
-            entity_map[e] = sequences[e.sequence]
+            entity_map[e] = existing
         else:
             # Otherwise, add the `other_s` Entity to `s`
             s.entities.append(e)
@@ -208,7 +211,7 @@ def combine_atoms(s, other_s, asym_map):
     s.state_groups.extend(other_s.state_groups)
 
 
-def get_args():
+def get_args(argv=None):
     p = argparse.ArgumentParser(
         description="Add minimal IHM-related tables to an mmCIF file.")
     p.add_argument("input", metavar="input.cif", help="input mmCIF file name")
@@ -218,11 +221,13 @@ def get_args():
     p.add_argument("--add", "-a", action='append', metavar="add.cif",
                    help="also add model information from the named mmCIF "
                         "file to the output file")
-    return p.parse_args()
+    return p.parse_args(argv)
 
 
-def main():
-    args = get_args()
+def main(argv=None):
+    """Run the script. `argv` is the list of command line arguments
+       (excluding the program name); if None, sys.argv is used."""
+    args = get_args(argv)
 
     if (os.path.exists(args.input) and os.path.exists(args.output)
             and os.path.samefile(args.input, args.output)):
@@ -21,8 +21,11 @@ if sys.platform == 'win32':
     # Our use of strdup, strerror should be safe - no need for the Windows
     # compiler to warn about it; we want to use the POSIX name for strdup too
     cargs = ['-D_CRT_SECURE_NO_WARNINGS', '-D_CRT_NONSTDC_NO_WARNINGS']
+    largs = []
 else:
-    cargs = []
+    # POSIX threads are used to decode BinaryCIF columns in parallel
+    cargs = ['-pthread']
+    largs = ['-pthread']
 
 if build_ext:
     # Use pre-built SWIG wrappers for stable releases so that end users
@@ -34,6 +37,7 @@ if build_ext:
                      sources=["src/ihm_format.c", "src/cmp.c", wrap],
                      include_dirs=['src'],
                      extra_compile_args=cargs,
+                     extra_link_args=largs,
                      swig_opts=['-keyword', '-nodefaultctor',
                                 '-nodefaultdtor', '-noproxy'])]
 else:
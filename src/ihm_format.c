@@ -22,6 +22,8 @@
 # include <io.h>
 #else
 # include <unistd.h>
+# include <pthread.h>
+# define IHM_HAVE_PTHREAD
 #endif
 #include <errno.h>
 #include <assert.h>
@@ -405,6 +407,8 @@ struct ihm_reader {
   /* Number of BinaryCIF data blocks left to read, or -1 if header
      not read yet */
   int num_blocks_left;
+  /* Maximum number of threads to use to decode BinaryCIF columns */
+  int num_threads;
 };
 
 typedef enum {
@@ -671,9 +675,22 @@ struct ihm_reader *ihm_reader_new(struct ihm_file *fh, bool binary)
   reader->unknown_keyword_free_func = NULL;
 
   reader->num_blocks_left = -1;
+  reader->num_threads = 1;
   return reader;
 }
 
+/* Set the maximum number of threads used to decode BinaryCIF columns */
+bool ihm_reader_set_num_threads(struct ihm_reader *reader, int num_threads)
+{
+#ifdef IHM_HAVE_PTHREAD
+  reader->num_threads = num_threads > 1 ? num_threads : 1;
+  return true;
+#else
+  reader->num_threads = 1;
+  return num_threads <= 1;
+#endif
+}
+
 /* Free memory used by a struct ihm_reader */
 void ihm_reader_free(struct ihm_reader *reader)
 {
@@ -2475,6 +2492,140 @@ static bool process_column_mask(struct bcif_column *col,
   return true;
 }
 
+/* Decode and check the column's data and mask, if any */
+static bool process_column(struct bcif_column *col, struct ihm_error **err)
+{
+  return process_column_data(col, err) && process_column_mask(col, err);
+}
+
+#ifdef IHM_HAVE_PTHREAD
+/* Only decode a category's columns in parallel if their total encoded size
+   is at least this many bytes. Threads are started for each category, and
+   for the many small categories in a typical file this costs more than
+   decoding them serially. */
+#define BCIF_PARALLEL_MIN_BYTES (256 * 1024)
+
+/* A subset of a category's columns, decoded by a single thread */
+struct bcif_decode_work {
+  /* All columns to be decoded */
+  struct bcif_column **cols;
+  /* Per-column errors (NULL if the column decoded successfully) */
+  struct ihm_error **errs;
+  /* Total number of columns */
+  size_t ncols;
+  /* This thread handles columns start, start+stride, start+2*stride... */
+  size_t start, stride;
+};
+
+/* Decode every column assigned to one thread, stopping at the first error */
+static void *decode_bcif_work(void *data)
+{
+  struct bcif_decode_work *work = (struct bcif_decode_work *)data;
+  size_t i;
+  for (i = work->start; i < work->ncols; i += work->stride) {
+    if (!process_column(work->cols[i], &work->errs[i])) break;
+  }
+  return NULL;
+}
+
+/* Decode columns using up to nthreads threads. Columns are independent,
+   so each thread writes only to its own columns. The error reported (if any)
+   is that of the first failing column, as for a serial decode. */
+static bool decode_bcif_columns_threaded(struct bcif_column **cols,
+                                         size_t ncols, size_t nthreads,
+                                         struct ihm_error **err)
+{
+  struct bcif_decode_work *work;
+  pthread_t *threads;
+  bool *started;
+  struct ihm_error **errs;
+  size_t i;
+
+  work = (struct bcif_decode_work *)ihm_malloc(
+                               nthreads * sizeof(struct bcif_decode_work));
+  threads = (pthread_t *)ihm_malloc(nthreads * sizeof(pthread_t));
+  started = (bool *)ihm_malloc(nthreads * sizeof(bool));
+  errs = (struct ihm_error **)ihm_malloc(ncols * sizeof(struct ihm_error *));
+  for (i = 0; i < ncols; ++i) {
+    errs[i] = NULL;
+  }
+  for (i = 0; i < nthreads; ++i) {
+    work[i].cols = cols;
+    work[i].errs = errs;
+    work[i].ncols = ncols;
+    work[i].start = i;
+    work[i].stride = nthreads;
+  }
+  /* The calling thread handles the first share of the work itself; if
+     a thread cannot be started, its work is also done here */
+  for (i = 1; i < nthreads; ++i) {
+    started[i] = (pthread_create(&threads[i], NULL, decode_bcif_work,
+                                 &work[i]) == 0);
+  }
+  decode_bcif_work(&work[0]);
+  for (i = 1; i < nthreads; ++i) {
+    if (started[i]) {
+      pthread_join(threads[i], NULL);
+    } else {
+      decode_bcif_work(&work[i]);
+    }
+  }
+
+  for (i = 0; i < ncols; ++i) {
+    if (errs[i]) {
+      if (*err) {
+        ihm_error_free(errs[i]);
+      } else {
+        *err = errs[i];
+      }
+    }
+  }
+  free(errs);
+  free(started);
+  free(threads);
+  free(work);
+  return *err == NULL;
+}
+#endif
+
+/* Decode and check the data and mask for all columns that map to
+   ihm_keywords, in parallel if requested */
+static bool decode_bcif_columns(struct ihm_reader *reader,
+                                struct bcif_category *cat,
+                                struct ihm_error **err)
+{
+  struct bcif_column *col;
+#ifdef IHM_HAVE_PTHREAD
+  size_t ncols = 0, nbytes = 0;
+  for (col = cat->first_column; col; col = col->next) {
+    if (col->keyword) {
+      ncols++;
+      /* Columns are not yet decoded, so this is the encoded data size */
+      nbytes += col->data.size;
+    }
+  }
+  if (reader->num_threads > 1 && ncols > 1
+      && nbytes >= BCIF_PARALLEL_MIN_BYTES) {
+    struct bcif_column **cols;
+    size_t i = 0, nthreads = (size_t)reader->num_threads;
+    bool ret;
+    if (nthreads > ncols) nthreads = ncols;
+    cols = (struct bcif_column **)ihm_malloc(
+                                 ncols * sizeof(struct bcif_column *));
+    for (col = cat->first_column; col; col = col->next) {
+      if (col->keyword) cols[i++] = col;
+    }
+    ret = decode_bcif_columns_threaded(cols, ncols, nthreads, err);
+    free(cols);
+    return ret;
+  }
+#endif
+  for (col = cat->first_column; col; col = col->next) {
+    if (col->keyword && !process_column(col, err)) return false;
+  }
+  return true;
+}
+
 /* Send the data for one category row to the callback */
 static bool process_bcif_row(struct ihm_reader *reader,
                              struct bcif_category *cat,
@@ -2533,11 +2684,10 @@ static bool process_bcif_category(struct ihm_reader *reader,
     }
     return true;
   }
-  if (!check_bcif_columns(reader, cat, ihm_cat, err)) return false;
+  if (!check_bcif_columns(reader, cat, ihm_cat, err)
+      || !decode_bcif_columns(reader, cat, err)) return false;
   for (col = cat->first_column; col; col = col->next) {
     if (!col->keyword) continue;
-    if (!process_column_data(col, err)
-        || !process_column_mask(col, err)) return false;
     /* Make buffer for value as a string; should be long enough to
        store any int or double */
     col->str = (char *)ihm_malloc(80);
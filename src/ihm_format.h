@@ -174,6 +174,14 @@ struct ihm_file *ihm_file_new_from_fd(int fd);
  */
 struct ihm_reader *ihm_reader_new(struct ihm_file *fh, bool binary);
 
+/* Set the maximum number of threads used to decode the columns of each
+   BinaryCIF category. The default is 1 (decode serially). Threads are only
+   used for categories with a large amount of data, and only on platforms
+   that support POSIX threads; elsewhere columns are always decoded
+   serially and false is returned if more than one thread was requested.
+   Category callbacks are always called from the calling thread. */
+bool ihm_reader_set_num_threads(struct ihm_reader *reader, int num_threads);
+
 /* Free memory used by a struct ihm_reader.
    Note that this does not close the
    underlying file descriptor or object that is wrapped by ihm_file. */
@@ -2,7 +2,7 @@ import utils
 import os
 import unittest
 import sys
-from test_format_bcif import MockMsgPack, MockFh, _add_msgpack
+from test_format_bcif import BinaryCifFh, real_msgpack, msgpack
 
 if sys.version_info[0] >= 3:
     from io import StringIO, BytesIO
@@ -14,11 +14,6 @@ TOPDIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 utils.set_search_paths(TOPDIR)
 import ihm.dictionary
 
-try:
-    from ihm import _format
-except ImportError:
-    _format = None
-
 
 def add_keyword(name, mandatory, category):
     k = ihm.dictionary.Keyword()
@@ -302,25 +297,21 @@ save_
         d = make_test_dictionary()
         d.validate(StringIO("_test_mandatory_category.bar 1"))
 
+    @unittest.skipIf(msgpack is None, "needs msgpack")
     def test_validate_ok_binary_cif(self):
         """Test successful validation of BinaryCIF input"""
-        sys.modules['msgpack'] = MockMsgPack
         d = make_test_dictionary()
-        fh = MockFh()
+        fh = BinaryCifFh()
         writer = ihm.format_bcif.BinaryCifWriter(fh)
         writer.start_block('ihm')
         with writer.category('_test_mandatory_category') as loc:
             loc.write(bar=1)
         with writer.category('_test_optional_category') as loc:
             loc.write(bar='enum1')
-        writer.flush()
-        if _format:
-            # Convert Python object into msgpack format for the C parser
-            bio = BytesIO()
-            _add_msgpack(fh.data, bio)
-            bio.seek(0)
-            fh.data = bio
-        d.validate(fh.data, format='BCIF')
+        with real_msgpack():
+            writer.flush()
+            fh.seek(0)
+            d.validate(fh, format='BCIF')
 
     def test_validate_multi_data_ok(self):
         """Test successful validation of multiple data blocks"""
@@ -26,7 +26,7 @@ import ihm.geometry
 import ihm.source
 import ihm.flr
 import ihm.multi_state_scheme
-from test_format_bcif import MockFh, MockMsgPack
+from test_format_bcif import BinaryCifFh, real_msgpack, msgpack
 
 
 def _get_dumper_output(dumper, system, check=True):
@@ -38,11 +38,11 @@ def _get_dumper_output(dumper, system, check=True):
 
 
 def _get_dumper_bcif_output(dumper, system):
-    fh = MockFh()
+    fh = BinaryCifFh()
     writer = ihm.format_bcif.BinaryCifWriter(fh)
-    sys.modules['msgpack'] = MockMsgPack
-    dumper.dump(system, writer)
-    writer.flush()
+    with real_msgpack():
+        dumper.dump(system, writer)
+        writer.flush()
     return fh.data
 
 
@@ -155,8 +155,9 @@ _struct.title 'test model'
 # Comment 2
 """)
         # Comments should be ignored in BinaryCIF output
-        out = _get_dumper_bcif_output(dumper, system)
-        self.assertEqual(out[u'dataBlocks'], [])
+        if msgpack is not None:
+            out = _get_dumper_bcif_output(dumper, system)
+            self.assertEqual(out[u'dataBlocks'], [])
 
     def test_software(self):
         """Test SoftwareDumper"""
@@ -3017,7 +3018,7 @@ _ihm_localization_density_files.entity_poly_segment_id
         # e2 is use, in a ResidueFeature, so should have a range ID
         self.assertEqual(e2._range_id, 2)
         # non-polymers don't have ranges
-        self.assertEqual(e3._range_id, None)
+        self.assertIsNone(e3._range_id)
         # res2 should have been assigned a range, but not res1
         self.assertFalse(hasattr(res1, '_range_id'))
         self.assertEqual(res2._range_id, 3)
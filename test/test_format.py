@@ -164,6 +164,30 @@ x .
 ? z
 '?' '.'
 #
+""")
+
+    def test_loop_write_columns(self):
+        """Test LoopWriter.write_columns method"""
+        fh = StringIO()
+        writer = ihm.format.CifWriter(fh)
+        with writer.loop('foo', ["bar", "baz"]) as loc:
+            loc.write(bar='x')
+            loc.write_columns(bar=[None, ihm.unknown, "?"],
+                              baz=['z', 'z', '.'], ignored=[1, 2, 3])
+            loc.write_columns(baz=['y'])
+            loc.write_columns(bar=[], baz=[])
+            self.assertRaises(ValueError, loc.write_columns,
+                              bar=['a', 'b'], baz=['c'])
+        self.assertEqual(fh.getvalue(), """#
+loop_
+foo.bar
+foo.baz
+x .
+. z
+? z
+'?' '.'
+. y
+#
 """)
 
     def test_loop_special_chars(self):
@@ -268,6 +292,23 @@ x
                            {'_exptl': h})
             self.assertEqual(h.data, [{'method': 'foo'}])
 
+    def test_unquoted_tokens(self):
+        """Test handling of lines with only unquoted tokens"""
+        cif = """
+loop_
+_foo.bar
+_foo.baz
+_foo.var1
+x#y\t. ?
+\t a\t\tb  c  \t
+"""
+        for real_file in (True, False):
+            h = GenericHandler()
+            self._read_cif(cif, real_file, {'_foo': h})
+            self.assertEqual(h.data,
+                             [{'bar': 'x#y', 'var1': ihm.unknown},
+                              {'bar': 'a', 'baz': 'b', 'var1': 'c'}])
+
     def test_missing_semicolon(self):
         """Make sure that missing semicolon is handled in multiline strings"""
         for real_file in (True, False):
@@ -3,8 +3,14 @@ import os
 import unittest
 import sys
 import struct
+import contextlib
 from io import BytesIO
 
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
 TOPDIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 utils.set_search_paths(TOPDIR)
 import ihm.format_bcif
@@ -15,22 +21,46 @@ except ImportError:
     _format = None
 
 
-# Provide dummy implementations of msgpack.unpack() and msgpack.pack() which
-# just return the data unchanged. We can use these to test the Python BinaryCIF
-# parser with Python objects rather than having to install msgpack and
-# generate real binary files
+# Provide a dummy implementation of msgpack.unpack() which just returns the
+# data unchanged. We can use this to test the Python BinaryCIF parser with
+# Python objects rather than having to install msgpack and generate real
+# binary files
 class MockMsgPack(object):
     @staticmethod
     def unpack(fh, raw=False):
         return fh
 
-    @staticmethod
-    def pack(data, fh, use_bin_type=True):
-        fh.data = data
 
+@contextlib.contextmanager
+def _patch_msgpack(module):
+    """Temporarily replace the msgpack module"""
+    orig_msgpack = sys.modules.get('msgpack')
+    sys.modules['msgpack'] = module
+    try:
+        yield
+    finally:
+        if orig_msgpack is None:
+            del sys.modules['msgpack']
+        else:
+            sys.modules['msgpack'] = orig_msgpack
+
+
+def mock_msgpack():
+    """Temporarily replace the msgpack module with MockMsgPack"""
+    return _patch_msgpack(MockMsgPack)
+
+
+def real_msgpack():
+    """Temporarily restore the real msgpack module, e.g. for writing"""
+    return _patch_msgpack(msgpack)
 
-class MockFh(object):
-    pass
+
+class BinaryCifFh(BytesIO):
+    """Capture the output of BinaryCifWriter (which needs the real msgpack
+       module). The output, decoded by msgpack, is available as `data`."""
+    @property
+    def data(self):
+        return msgpack.unpackb(self.getvalue(), raw=False)
 
 
 class GenericHandler(object):
@@ -183,6 +213,20 @@ def _python_to_msgpack(d):
 
 
 class Tests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Install the mock msgpack module once for all tests, and restore
+        # the original (if any) afterwards so other modules are unaffected
+        cls._orig_msgpack = sys.modules.get('msgpack')
+        sys.modules['msgpack'] = MockMsgPack
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls._orig_msgpack is None:
+            del sys.modules['msgpack']
+        else:
+            sys.modules['msgpack'] = cls._orig_msgpack
+
     def test_decode_bytes(self):
         """Test decode_bytes function"""
         d = ihm.format_bcif._decode_bytes(u'foo')
@@ -380,12 +424,17 @@ class Tests(unittest.TestCase):
                    unknown_category_handler=None,
                    unknown_keyword_handler=None):
         fh = _make_bcif_file(blocks)
-        sys.modules['msgpack'] = MockMsgPack
         r = ihm.format_bcif.BinaryCifReader(fh, category_handlers,
                                             unknown_category_handler,
                                             unknown_keyword_handler)
         r.read_file()
 
+    def test_reader_prefers_c(self):
+        """Test that the C reader is used if available"""
+        fh = _make_bcif_file([])
+        r = ihm.format_bcif.BinaryCifReader(fh, {})
+        self.assertEqual(hasattr(r, '_c_format'), _format is not None)
+
     def test_category_case_insensitive(self):
         """Categories and keywords should be case insensitive"""
         cat1 = Category(u'_exptl', {u'method': [u'foo']})
@@ -405,9 +454,10 @@ class Tests(unittest.TestCase):
                          [{u'var1': u'test1'}, {u'var1': u'?'},
                           {u'var1': u'test2'}, {}, {u'var1': u'test3'}])
 
-    def _read_bcif_raw(self, d, category_handlers):
+    def _read_bcif_raw(self, d, category_handlers, num_threads=1):
         fh = _python_to_msgpack(d)
-        r = ihm.format_bcif.BinaryCifReader(fh, category_handlers)
+        r = ihm.format_bcif.BinaryCifReader(fh, category_handlers,
+                                            num_threads=num_threads)
         r.read_file()
 
     @unittest.skipIf(_format is None, "No C tokenizer")
@@ -969,6 +1019,89 @@ class Tests(unittest.TestCase):
         self.assertRaises(_format.FileFormatError, self._read_bcif_raw,
                           d, {'_foo': h})
 
+    @unittest.skipIf(_format is None, "No C tokenizer")
+    def test_process_bcif_category_threaded_c(self):
+        """Test processing of BinaryCIF category using multiple threads"""
+        def make_column(name, data, data_type=ihm.format_bcif._Int8):
+            return {u'name': name,
+                    u'data': {u'data': data,
+                              u'encoding':
+                              [{u'kind': u'IntegerPacking'},
+                               {u'kind': u'ByteArray', u'type': data_type}]}}
+
+        def make_bcif(columns):
+            return {u'dataBlocks': [{u'categories': [{u'name': u'_foo',
+                                                      u'columns': columns}]}]}
+
+        class _ThrowHandler(GenericHandler):
+            def __call__(self, *args):
+                raise ValueError("some error")
+
+        cols = [make_column(u'bar', struct.pack('2b', 1, 42)),
+                make_column(u'baz', struct.pack('2b', 8, 4)),
+                make_column(u'var1', struct.pack('2b', 3, 5)),
+                make_column(u'unknown', struct.pack('2b', 0, 0))]
+        for num_threads in (2, 3, 8):
+            h = GenericHandler()
+            self._read_bcif_raw(make_bcif(cols), {'_foo': h},
+                                num_threads=num_threads)
+            self.assertEqual(h.data,
+                             [{'bar': '1', 'baz': '8', 'var1': '3'},
+                              {'bar': '42', 'baz': '4', 'var1': '5'}])
+
+        # Handler errors should be propagated
+        h = _ThrowHandler()
+        self.assertRaises(ValueError, self._read_bcif_raw, make_bcif(cols),
+                          {'_foo': h}, num_threads=2)
+
+        # Decoding errors in any column should be propagated
+        bad_cols = cols[:2] + [make_column(u'var1', struct.pack('2b', 3, 5),
+                                           data_type=ihm.format_bcif._Float32)]
+        h = GenericHandler()
+        self.assertRaises(_format.FileFormatError, self._read_bcif_raw,
+                          make_bcif(bad_cols), {'_foo': h}, num_threads=2)
+
+        # Mismatched column size
+        bad_cols = cols[:2] + [make_column(u'var1',
+                                           struct.pack('3b', 3, 5, 7))]
+        h = GenericHandler()
+        self.assertRaises(_format.FileFormatError, self._read_bcif_raw,
+                          make_bcif(bad_cols), {'_foo': h}, num_threads=2)
+
+    @unittest.skipIf(_format is None, "No C tokenizer")
+    def test_process_bcif_large_category_threaded_c(self):
+        """Test processing of large BinaryCIF category using threads"""
+        def make_column(name, data, data_type=ihm.format_bcif._Int32):
+            return {u'name': name,
+                    u'data': {u'data': data,
+                              u'encoding':
+                              [{u'kind': u'ByteArray', u'type': data_type}]}}
+
+        def make_bcif(columns):
+            return {u'dataBlocks': [{u'categories': [{u'name': u'_foo',
+                                                      u'columns': columns}]}]}
+
+        # Make the category large enough that it is decoded in parallel
+        nrows = 40000
+        cols = [make_column(name, struct.pack('<%di' % nrows,
+                                              *range(i, i + nrows)))
+                for i, name in enumerate((u'bar', u'baz', u'var1'))]
+        for num_threads in (1, 2, 3):
+            h = GenericHandler()
+            self._read_bcif_raw(make_bcif(cols), {'_foo': h},
+                                num_threads=num_threads)
+            self.assertEqual(len(h.data), nrows)
+            self.assertEqual(h.data[0], {'bar': '0', 'baz': '1', 'var1': '2'})
+            self.assertEqual(h.data[-1], {'bar': '39999', 'baz': '40000',
+                                          'var1': '40001'})
+
+        # Decoding errors in any column should be propagated
+        bad_cols = cols[:2] + [make_column(u'var1', cols[2][u'data'][u'data'],
+                                           data_type=99)]
+        h = GenericHandler()
+        self.assertRaises(_format.FileFormatError, self._read_bcif_raw,
+                          make_bcif(bad_cols), {'_foo': h}, num_threads=2)
+
     def test_omitted_unknown_not_in_file_explicit(self):
         """Test explicit handling of omitted/unknown/not in file data"""
         cat = Category(u'_foo',
@@ -1045,7 +1178,6 @@ class Tests(unittest.TestCase):
 
         h = GenericHandler()
         r = ihm.format_bcif.BinaryCifReader(fh, {'_foo': h})
-        sys.modules['msgpack'] = MockMsgPack
         # Read first data block
         self.assertTrue(r.read_file())
         self.assertEqual(h.data, [{u'var1': u'test1', u'var2': u'test2'}])
@@ -1183,7 +1315,7 @@ class Tests(unittest.TestCase):
         """Test get_mask_and_type with masked int data"""
         data = [1, 2, 3, None, ihm.unknown, 4]
         mask, typ = ihm.format_bcif._get_mask_and_type(data)
-        self.assertEqual(mask, [0, 0, 0, 1, 2, 0])
+        self.assertEqual(mask, bytearray([0, 0, 0, 1, 2, 0]))
         self.assertEqual(typ, int)
 
     def test_mask_type_masked_long(self):
@@ -1195,14 +1327,14 @@ class Tests(unittest.TestCase):
             data = [long(1), long(2), long(3),    # noqa: F821
                     None, ihm.unknown, long(4)]   # noqa: F821
             mask, typ = ihm.format_bcif._get_mask_and_type(data)
-            self.assertEqual(mask, [0, 0, 0, 1, 2, 0])
+            self.assertEqual(mask, bytearray([0, 0, 0, 1, 2, 0]))
             self.assertEqual(typ, int)
 
     def test_mask_type_masked_float(self):
         """Test get_mask_and_type with masked float data"""
         data = [1.0, 2.0, 3.0, None, ihm.unknown, 4.0]
         mask, typ = ihm.format_bcif._get_mask_and_type(data)
-        self.assertEqual(mask, [0, 0, 0, 1, 2, 0])
+        self.assertEqual(mask, bytearray([0, 0, 0, 1, 2, 0]))
         self.assertEqual(typ, float)
 
     def test_mask_type_masked_numpy_float(self):
@@ -1213,7 +1345,7 @@ class Tests(unittest.TestCase):
             self.skipTest("this test requires numpy")
         data = [numpy.float64(4.2), None, ihm.unknown]
         mask, typ = ihm.format_bcif._get_mask_and_type(data)
-        self.assertEqual(mask, [0, 1, 2])
+        self.assertEqual(mask, bytearray([0, 1, 2]))
         self.assertEqual(typ, float)
 
     def test_mask_type_masked_str(self):
@@ -1221,7 +1353,7 @@ class Tests(unittest.TestCase):
         # Literal . and ? should not be masked
         data = ['a', 'b', None, ihm.unknown, 'c', '.', '?']
         mask, typ = ihm.format_bcif._get_mask_and_type(data)
-        self.assertEqual(mask, [0, 0, 1, 2, 0, 0, 0])
+        self.assertEqual(mask, bytearray([0, 0, 1, 2, 0, 0, 0]))
         self.assertEqual(typ, str)
 
     def test_mask_type_mix_int_float(self):
@@ -1311,6 +1443,15 @@ class Tests(unittest.TestCase):
         self.assertEqual(encs, [{'kind': 'ByteArray',
                                  'type': ihm.format_bcif._Float32}])
 
+    def test_byte_array_encoder_bytearray(self):
+        """Test ByteArray encoder with bytearray input"""
+        d = ihm.format_bcif._ByteArrayEncoder()
+        data, encd = d(bytearray([0, 1, 2, 255]))
+        self.assertEqual(data, b'\x00\x01\x02\xff')
+        self.assertIsInstance(data, bytes)
+        self.assertEqual(encd, {'kind': 'ByteArray',
+                                'type': ihm.format_bcif._Uint8})
+
     def test_float_array_encoder_mask(self):
         """Test FloatArray encoder with mask"""
         d = ihm.format_bcif._FloatArrayMaskedEncoder()
@@ -1319,15 +1460,16 @@ class Tests(unittest.TestCase):
         self.assertEqual(encs, [{'kind': 'ByteArray',
                                  'type': ihm.format_bcif._Float32}])
 
+    @unittest.skipIf(msgpack is None, "needs msgpack")
     def test_category(self):
         """Test CategoryWriter class"""
-        fh = MockFh()
-        sys.modules['msgpack'] = MockMsgPack
+        fh = BinaryCifFh()
         writer = ihm.format_bcif.BinaryCifWriter(fh)
         writer.start_block('ihm')
         with writer.category('foo') as loc:
             loc.write(bar='baz')
-        writer.flush()
+        with real_msgpack():
+            writer.flush()
         block, = fh.data['dataBlocks']
         category, = block['categories']
         column, = category['columns']
@@ -1338,21 +1480,48 @@ class Tests(unittest.TestCase):
         self.assertEqual(column['data']['encoding'][0]['stringData'],
                          'baz')
 
+    @unittest.skipIf(msgpack is None, "needs msgpack")
+    def test_write_after_flush(self):
+        """Test writing categories after flush"""
+        def write_category(writer):
+            with writer.category('foo') as loc:
+                loc.write(bar='baz')
+        fh = BinaryCifFh()
+        writer = ihm.format_bcif.BinaryCifWriter(fh)
+        # Categories cannot be written outside of a block
+        self.assertRaises(ValueError, write_category, writer)
+        writer.start_block('ihm')
+        write_category(writer)
+        with real_msgpack():
+            writer.flush()
+        # Flushed block is finished, so writes should not be silently dropped
+        self.assertRaises(ValueError, write_category, writer)
+        fh = writer.fh = BinaryCifFh()
+        writer.start_block('ihm2')
+        write_category(writer)
+        with real_msgpack():
+            writer.flush()
+        block, = fh.data['dataBlocks']
+        category, = block['categories']
+        self.assertEqual(block['header'], 'ihm2')
+        self.assertEqual(category['name'], 'foo')
+
+    @unittest.skipIf(msgpack is None, "needs msgpack")
     def test_empty_loop(self):
         """Test LoopWriter class with no values"""
-        fh = MockFh()
-        sys.modules['msgpack'] = MockMsgPack
+        fh = BinaryCifFh()
         writer = ihm.format_bcif.BinaryCifWriter(fh)
         writer.start_block('ihm')
         with writer.loop('foo', ["bar", "baz"]):
             pass
-        writer.flush()
+        with real_msgpack():
+            writer.flush()
         self.assertEqual(fh.data['dataBlocks'][0]['categories'], [])
 
+    @unittest.skipIf(msgpack is None, "needs msgpack")
     def test_loop(self):
         """Test LoopWriter class"""
-        fh = MockFh()
-        sys.modules['msgpack'] = MockMsgPack
+        fh = BinaryCifFh()
         writer = ihm.format_bcif.BinaryCifWriter(fh)
         writer.start_block('ihm')
         with writer.loop('foo', ["bar", "baz"]) as lp:
@@ -1362,7 +1531,8 @@ class Tests(unittest.TestCase):
             lp.write(bar='.', baz='z')
             lp.write(bar='?', baz='z')
             lp.write(baz='y')
-        writer.flush()
+        with real_msgpack():
+            writer.flush()
         block, = fh.data['dataBlocks']
         category, = block['categories']
         self.assertEqual(category['name'], 'foo')
@@ -1373,6 +1543,28 @@ class Tests(unittest.TestCase):
         self.assertEqual(cols[0]['mask']['data'],
                          b'\x00\x01\x02\x00\x00\x01')
 
+    @unittest.skipIf(msgpack is None, "needs msgpack")
+    def test_loop_write_columns(self):
+        """Test LoopWriter.write_columns method"""
+        fh = BinaryCifFh()
+        writer = ihm.format_bcif.BinaryCifWriter(fh)
+        writer.start_block('ihm')
+        with writer.loop('foo', ["bar", "baz"]) as lp:
+            lp.write(bar='x')
+            lp.write_columns(bar=[None, ihm.unknown, '.', '?'],
+                             baz=['z', 'z', 'z', 'z'], ignored=[1, 2, 3, 4])
+            lp.write_columns(baz=['y'])
+            self.assertRaises(ValueError, lp.write_columns,
+                              bar=['a', 'b'], baz=['c'])
+        with real_msgpack():
+            writer.flush()
+        block, = fh.data['dataBlocks']
+        category, = block['categories']
+        self.assertEqual(category['rowCount'], 6)
+        cols = sorted(category['columns'], key=lambda x: x['name'])
+        self.assertEqual(cols[0]['mask']['data'],
+                         b'\x00\x01\x02\x00\x00\x01')
+
 
 if __name__ == '__main__':
     unittest.main()
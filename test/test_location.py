@@ -189,8 +189,10 @@ class Tests(unittest.TestCase):
         """Test InputFileLocation with a local file that doesn't exist"""
         with utils.temporary_directory() as tmpdir:
             fname = os.path.join(tmpdir, 'test.pdb')
-            self.assertRaises(
-                ValueError, ihm.location.InputFileLocation, fname)
+            with self.assertRaises(ValueError) as cm:
+                ihm.location.InputFileLocation(fname)
+            # The underlying OSError should not be chained to the ValueError
+            self.assertIsNone(getattr(cm.exception, '__context__', None))
 
     def test_file_location_repo(self):
         """Test InputFileLocation with a file in a repository"""
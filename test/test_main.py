@@ -1,6 +1,7 @@
 import utils
 import os
 import unittest
+import copy
 try:
     import urllib.request as urllib2
 except ImportError:
@@ -1353,6 +1354,12 @@ class Tests(unittest.TestCase):
         self.assertFalse(u > u)
         # Should act like False
         self.assertFalse(u)
+        # Copies should be the same object
+        self.assertIs(copy.copy(u), u)
+        self.assertIs(copy.deepcopy(u), u)
+        s = ihm.Software(name='foo', classification='bar',
+                         description='baz', location=ihm.unknown)
+        self.assertIs(copy.deepcopy(s).location, u)
 
     def test_branch_descriptor(self):
         """Test the BranchDescriptor class"""
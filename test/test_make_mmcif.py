@@ -3,6 +3,9 @@ import os
 import sys
 import unittest
 import subprocess
+from io import StringIO
+if sys.version_info[0] >= 3:
+    from unittest import mock
 
 TOPDIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 utils.set_search_paths(TOPDIR)
@@ -13,62 +16,74 @@ import ihm.util.make_mmcif  # Script should also be importable
 MAKE_MMCIF = os.path.join(TOPDIR, 'ihm', 'util', 'make_mmcif.py')
 
 
+def run_make_mmcif(*args):
+    """Run the make_mmcif script in this process with the given arguments"""
+    ihm.util.make_mmcif.main(list(args))
+
+
 class Tests(unittest.TestCase):
     @unittest.skipIf(sys.version_info[0] < 3, "make_mmcif.py needs Python 3")
     def test_simple(self):
         """Simple test of make_mmcif utility script"""
         incif = utils.get_input_file_name(TOPDIR, 'struct_only.cif')
-        subprocess.check_call([sys.executable, MAKE_MMCIF, incif])
-        with open('output.cif') as fh:
-            s, = ihm.reader.read(fh)
+        # Run this one as a real script, to test the command line interface
+        # (and the default output file name)
+        with utils.temporary_directory() as tmpdir:
+            subprocess.check_call([sys.executable, MAKE_MMCIF, incif],
+                                  cwd=tmpdir)
+            with open(os.path.join(tmpdir, 'output.cif')) as fh:
+                s, = ihm.reader.read(fh)
         self.assertEqual(s.title,
                          'Architecture of Pol II(G) and molecular mechanism '
                          'of transcription regulation by Gdown1')
-        os.unlink('output.cif')
 
     @unittest.skipIf(sys.version_info[0] < 3, "make_mmcif.py needs Python 3")
     def test_non_default_output(self):
         """Simple test of make_mmcif with non-default output name"""
         incif = utils.get_input_file_name(TOPDIR, 'struct_only.cif')
-        subprocess.check_call([sys.executable, MAKE_MMCIF, incif,
-                               'non-default-output.cif'])
-        with open('non-default-output.cif') as fh:
-            s, = ihm.reader.read(fh)
+        with utils.temporary_directory() as tmpdir:
+            output = os.path.join(tmpdir, 'non-default-output.cif')
+            run_make_mmcif(incif, output)
+            with open(output) as fh:
+                s, = ihm.reader.read(fh)
         self.assertEqual(s.title,
                          'Architecture of Pol II(G) and molecular mechanism '
                          'of transcription regulation by Gdown1')
-        os.unlink('non-default-output.cif')
 
     @unittest.skipIf(sys.version_info[0] < 3, "make_mmcif.py needs Python 3")
     def test_no_title(self):
         """Check that make_mmcif adds missing title"""
         incif = utils.get_input_file_name(TOPDIR, 'no_title.cif')
-        subprocess.check_call([sys.executable, MAKE_MMCIF, incif])
-        with open('output.cif') as fh:
-            s, = ihm.reader.read(fh)
+        with utils.temporary_directory() as tmpdir:
+            output = os.path.join(tmpdir, 'output.cif')
+            run_make_mmcif(incif, output)
+            with open(output) as fh:
+                s, = ihm.reader.read(fh)
         self.assertEqual(s.title, 'Auto-generated system')
-        os.unlink('output.cif')
 
     @unittest.skipIf(sys.version_info[0] < 3, "make_mmcif.py needs Python 3")
     def test_bad_usage(self):
         """Bad usage of make_mmcif utility script"""
-        ret = subprocess.call([sys.executable, MAKE_MMCIF])
-        self.assertEqual(ret, 2)
+        with mock.patch('sys.stderr', new_callable=StringIO):
+            with self.assertRaises(SystemExit) as cm:
+                run_make_mmcif()
+        self.assertEqual(cm.exception.code, 2)
 
     @unittest.skipIf(sys.version_info[0] < 3, "make_mmcif.py needs Python 3")
     def test_same_file(self):
         """Check that make_mmcif fails if input and output are the same"""
         incif = utils.get_input_file_name(TOPDIR, 'struct_only.cif')
-        ret = subprocess.call([sys.executable, MAKE_MMCIF, incif, incif])
-        self.assertEqual(ret, 1)
+        self.assertRaises(ValueError, run_make_mmcif, incif, incif)
 
     @unittest.skipIf(sys.version_info[0] < 3, "make_mmcif.py needs Python 3")
     def test_mini(self):
         """Check that make_mmcif works given only basic atom info"""
         incif = utils.get_input_file_name(TOPDIR, 'mini.cif')
-        subprocess.check_call([sys.executable, MAKE_MMCIF, incif])
-        with open('output.cif') as fh:
-            s, = ihm.reader.read(fh)
+        with utils.temporary_directory() as tmpdir:
+            output = os.path.join(tmpdir, 'output.cif')
+            run_make_mmcif(incif, output)
+            with open(output) as fh:
+                s, = ihm.reader.read(fh)
         self.assertEqual(len(s.state_groups), 1)
         self.assertEqual(len(s.state_groups[0]), 1)
         self.assertEqual(len(s.state_groups[0][0]), 1)
@@ -81,15 +96,16 @@ class Tests(unittest.TestCase):
             self.assertIsInstance(chain, ihm.representation.AtomicSegment)
             self.assertFalse(chain.rigid)
         self.assertEqual(s.title, 'Auto-generated system')
-        os.unlink('output.cif')
 
     @unittest.skipIf(sys.version_info[0] < 3, "make_mmcif.py needs Python 3")
     def test_pass_through(self):
         """Check that make_mmcif passes through already-compliant files"""
         incif = utils.get_input_file_name(TOPDIR, 'docking.cif')
-        subprocess.check_call([sys.executable, MAKE_MMCIF, incif])
-        with open('output.cif') as fh:
-            s, = ihm.reader.read(fh)
+        with utils.temporary_directory() as tmpdir:
+            output = os.path.join(tmpdir, 'output.cif')
+            run_make_mmcif(incif, output)
+            with open(output) as fh:
+                s, = ihm.reader.read(fh)
         self.assertEqual(len(s.state_groups), 1)
         self.assertEqual(len(s.state_groups[0]), 1)
         self.assertEqual(len(s.state_groups[0][0]), 1)
@@ -103,7 +119,6 @@ class Tests(unittest.TestCase):
         self.assertIsInstance(chain_b, ihm.representation.FeatureSegment)
         self.assertFalse(chain_b.rigid)
         self.assertEqual(s.title, 'Output from simple-docking example')
-        os.unlink('output.cif')
 
     @unittest.skipIf(sys.version_info[0] < 3, "make_mmcif.py needs Python 3")
     def test_add_polymers(self):
@@ -113,10 +128,11 @@ class Tests(unittest.TestCase):
         # mini_add.cif also contains A, B; A is the same sequence as mini.cif
         # but B is different (so should be renamed C when we add)
         addcif = utils.get_input_file_name(TOPDIR, 'mini_add.cif')
-        subprocess.check_call([sys.executable, MAKE_MMCIF, incif,
-                               '--add', addcif])
-        with open('output.cif') as fh:
-            s, = ihm.reader.read(fh)
+        with utils.temporary_directory() as tmpdir:
+            output = os.path.join(tmpdir, 'output.cif')
+            run_make_mmcif(incif, output, '--add', addcif)
+            with open(output) as fh:
+                s, = ihm.reader.read(fh)
         self.assertEqual(len(s.entities), 3)
         self.assertEqual(len(s.asym_units), 3)
         self.assertEqual(len(s.state_groups), 2)
@@ -147,7 +163,6 @@ class Tests(unittest.TestCase):
             self.assertIsInstance(chain, ihm.representation.AtomicSegment)
             self.assertFalse(chain.rigid)
         self.assertEqual(s.title, 'Auto-generated system')
-        os.unlink('output.cif')
 
     @unittest.skipIf(sys.version_info[0] < 3, "make_mmcif.py needs Python 3")
     def test_add_non_polymers(self):
@@ -158,10 +173,11 @@ class Tests(unittest.TestCase):
         # provided residue number as mini_nonpoly.cif but B is different
         # (so should be renamed C when we add)
         addcif = utils.get_input_file_name(TOPDIR, 'mini_nonpoly_add.cif')
-        subprocess.check_call([sys.executable, MAKE_MMCIF, incif,
-                               '--add', addcif])
-        with open('output.cif') as fh:
-            s, = ihm.reader.read(fh)
+        with utils.temporary_directory() as tmpdir:
+            output = os.path.join(tmpdir, 'output.cif')
+            run_make_mmcif(incif, output, '--add', addcif)
+            with open(output) as fh:
+                s, = ihm.reader.read(fh)
         self.assertEqual(len(s.entities), 1)
         self.assertEqual(len(s.asym_units), 3)
         self.assertEqual(len(s.state_groups), 2)
@@ -192,7 +208,6 @@ class Tests(unittest.TestCase):
             self.assertIsInstance(chain, ihm.representation.AtomicSegment)
             self.assertFalse(chain.rigid)
         self.assertEqual(s.title, 'Auto-generated system')
-        os.unlink('output.cif')
 
     @unittest.skipIf(sys.version_info[0] < 3, "make_mmcif.py needs Python 3")
     def test_add_multi_data(self):
@@ -201,22 +216,24 @@ class Tests(unittest.TestCase):
         addcif = utils.get_input_file_name(TOPDIR, 'mini_add.cif')
         with open(addcif) as fh:
             addcif_contents = fh.read()
-        addcif_multi = 'addcif_multi.cif'
-        with open(addcif_multi, 'w') as fh:
-            fh.write(addcif_contents)
-            fh.write(addcif_contents.replace('data_model', 'data_model2'))
-        ret = subprocess.call([sys.executable, MAKE_MMCIF, incif,
-                               '--add', addcif_multi])
-        self.assertEqual(ret, 1)
-        os.unlink(addcif_multi)
+        with utils.temporary_directory() as tmpdir:
+            addcif_multi = os.path.join(tmpdir, 'addcif_multi.cif')
+            with open(addcif_multi, 'w') as fh:
+                fh.write(addcif_contents)
+                fh.write(addcif_contents.replace('data_model', 'data_model2'))
+            self.assertRaises(ValueError, run_make_mmcif, incif,
+                              os.path.join(tmpdir, 'output.cif'),
+                              '--add', addcif_multi)
 
     @unittest.skipIf(sys.version_info[0] < 3, "make_mmcif.py needs Python 3")
     def test_not_modeled(self):
         """Check addition of not-modeled residue information"""
         incif = utils.get_input_file_name(TOPDIR, 'not_modeled.cif')
-        subprocess.check_call([sys.executable, MAKE_MMCIF, incif])
-        with open('output.cif') as fh:
-            s, = ihm.reader.read(fh)
+        with utils.temporary_directory() as tmpdir:
+            output = os.path.join(tmpdir, 'output.cif')
+            run_make_mmcif(incif, output)
+            with open(output) as fh:
+                s, = ihm.reader.read(fh)
         # Residues 5 and 6 in chain A, and 2 in chain B, are missing from
         # atom_site. But the file already has an _ihm_residues_not_modeled
         # table listing residue 5:A, so we expect to see just 6:A and 2:B
@@ -229,7 +246,6 @@ class Tests(unittest.TestCase):
         self.assertEqual(r2.asym_unit._id, 'A')
         self.assertEqual((r3.seq_id_begin, r3.seq_id_end), (2, 2))
         self.assertEqual(r3.asym_unit._id, 'B')
-        os.unlink('output.cif')
 
 
 if __name__ == '__main__':
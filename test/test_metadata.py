@@ -2,17 +2,18 @@ import utils
 import os
 import unittest
 import warnings
-import sys
+import json
+import time
+import shutil
+import contextlib
+import threading
 try:
     import urllib.request as urlrequest
     import urllib.error as urlerror
 except ImportError:
     import urllib2 as urlrequest
     urlerror = urlrequest
-if sys.version_info[0] >= 3:
-    from io import StringIO
-else:
-    from io import BytesIO as StringIO
+from io import BytesIO
 
 TOPDIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 utils.set_search_paths(TOPDIR)
@@ -22,9 +23,63 @@ try:
     from ihm import _format
 except ImportError:
     _format = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+def _ok_urlopen(url, timeout=None):
+    """Mock urlopen that returns a valid EMDB API response"""
+    return BytesIO(
+        b'{"admin": {"key_dates": {"map_release": "2011-04-21"},'
+        b'"title": "test details"}}')
+
+
+def _bad_urlopen(url, timeout=None):
+    """Mock urlopen that simulates a network error"""
+    raise urlerror.URLError("Mock network error")
+
+
+def _raise_urlopen(url, timeout=None):
+    """Mock urlopen for tests that should never access the network"""
+    raise ValueError("shouldn't be here")
+
+
+class _RecordingUrlopen(object):
+    """Wrap a mock urlopen function, recording each URL requested"""
+    def __init__(self, func):
+        self.func = func
+        self.calls = []
+
+    def __call__(self, url, timeout=None):
+        self.calls.append(url)
+        return self.func(url, timeout)
+
+
+@contextlib.contextmanager
+def _patch_urlopen(mock_urlopen):
+    """Temporarily replace urlopen, so that tests don't hit the network"""
+    orig_urlopen = urlrequest.urlopen
+    urlrequest.urlopen = mock_urlopen
+    try:
+        yield
+    finally:
+        urlrequest.urlopen = orig_urlopen
 
 
 class Tests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Parsers keep no state between files, so can be shared by all tests
+        cls._pdb_parser = ihm.metadata.PDBParser()
+        cls._cif_parser = ihm.metadata.CIFParser()
+
+    def setUp(self):
+        # Don't let EMDB metadata cached by one test leak into another
+        ihm.metadata.clear_emdb_cache()
+        ihm.metadata.clear_parse_cache()
+        self.addCleanup(ihm.metadata.set_emdb_cache, False)
 
     def test_parser(self):
         """Test Parser base class"""
@@ -47,12 +102,21 @@ class Tests(unittest.TestCase):
                              'Electron microscopy density map')
             self.assertIsNone(dataset.location.repo)
 
+    def test_mrc_parser_too_many_labels(self):
+        """Test MRCParser with an invalid number of labels"""
+        p = ihm.metadata.MRCParser()
+        with utils.temporary_directory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.mrc')
+            with open(fname, 'wb') as fh:
+                # Claim 50 labels; only 10 fit in the header, and the
+                # EMDB label that follows the header should be ignored
+                fh.write(b'\0' * 220 + b'\x32\0\0\0' + b' ' * 800
+                         + b'::::EMDATABANK.org::::EMD-1883::::')
+            d = p.parse_file(fname)
+            self.assertEqual(d['dataset'].location.path, fname)
+
     def test_mrc_parser_emdb_ok(self):
         """Test MRCParser pointing to an MRC in EMDB, no network errors"""
-        def mock_urlopen(url, timeout=None):
-            return StringIO(
-                '{"admin": {"key_dates": {"map_release": "2011-04-21"},'
-                '"title": "test details"}}')
         p = ihm.metadata.MRCParser()
         fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
         d = p.parse_file(fname)
@@ -64,22 +128,161 @@ class Tests(unittest.TestCase):
 
         # Need to mock out urllib.request so we don't hit the network
         # (expensive) every time we test
-        try:
-            orig_urlopen = urlrequest.urlopen
-            urlrequest.urlopen = mock_urlopen
+        with _patch_urlopen(_ok_urlopen):
             self.assertEqual(dataset.location.version, '2011-04-21')
             self.assertEqual(dataset.location.details, 'test details')
             dataset.location.version = 'my version'
             dataset.location.details = 'my details'
             self.assertEqual(dataset.location.version, 'my version')
             self.assertEqual(dataset.location.details, 'my details')
-        finally:
-            urlrequest.urlopen = orig_urlopen
+
+    def test_mrc_parser_emdb_lazy(self):
+        """Test MRCParser does not query EMDB until metadata is needed"""
+        mock_urlopen = _RecordingUrlopen(_ok_urlopen)
+        p = ihm.metadata.MRCParser()
+        fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
+        with _patch_urlopen(mock_urlopen):
+            d = p.parse_file(fname)
+            loc = d['dataset'].location
+            self.assertEqual(loc.db_name, 'EMDB')
+            self.assertEqual(loc.access_code, 'EMD-1883')
+            self.assertEqual(mock_urlopen.calls, [])
+            self.assertEqual(loc.version, '2011-04-21')
+            self.assertEqual(len(mock_urlopen.calls), 1)
+
+    def test_mrc_parser_emdb_uncached(self):
+        """Test MRCParser queries EMDB for each entry by default"""
+        mock_urlopen = _RecordingUrlopen(_ok_urlopen)
+        p = ihm.metadata.MRCParser()
+        fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
+        d1 = p.parse_file(fname)
+        d2 = p.parse_file(fname)
+        with _patch_urlopen(mock_urlopen):
+            for d in d1, d2:
+                self.assertEqual(d['dataset'].location.version, '2011-04-21')
+        self.assertEqual(len(mock_urlopen.calls), 2)
+        self.assertEqual(len(ihm.metadata._emdb_info_cache), 0)
+
+    def test_mrc_parser_emdb_cached(self):
+        """Test MRCParser only queries EMDB once for each entry"""
+        ihm.metadata.set_emdb_cache(persist=False)
+        mock_urlopen = _RecordingUrlopen(_ok_urlopen)
+        p = ihm.metadata.MRCParser()
+        fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
+        d1 = p.parse_file(fname)
+        d2 = p.parse_file(fname)
+        with _patch_urlopen(mock_urlopen):
+            for d in d1, d2:
+                self.assertEqual(d['dataset'].location.version, '2011-04-21')
+                self.assertEqual(d['dataset'].location.details,
+                                 'test details')
+        self.assertEqual(len(mock_urlopen.calls), 1)
+        # Overriding metadata for one location should not affect another
+        d1['dataset'].location.version = 'my version'
+        self.assertEqual(d2['dataset'].location.version, '2011-04-21')
+
+    def test_mrc_parser_emdb_prefetch(self):
+        """Test MRCParser prefetching EMDB metadata"""
+        ihm.metadata.set_emdb_cache(persist=False)
+        mock_urlopen = _RecordingUrlopen(_ok_urlopen)
+        p = ihm.metadata.MRCParser(prefetch=True)
+        fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
+        with _patch_urlopen(mock_urlopen):
+            d1 = p.parse_file(fname)
+            d2 = p.parse_file(fname)
+            for d in d1, d2:
+                self.assertEqual(d['dataset'].location.version, '2011-04-21')
+                self.assertEqual(d['dataset'].location.details,
+                                 'test details')
+            # Metadata is already available, so no need to prefetch again
+            d3 = p.parse_file(fname)
+            self.assertEqual(d3['dataset'].location.version, '2011-04-21')
+        self.assertEqual(len(mock_urlopen.calls), 1)
+
+    def test_mrc_parser_emdb_prefetch_prune(self):
+        """Test that finished EMDB prefetch threads are discarded"""
+        ihm.metadata.set_emdb_cache(persist=False)
+        with _patch_urlopen(_ok_urlopen):
+            ihm.metadata._prefetch_emdb_info('EMD-1883')
+            ihm.metadata._emdb_prefetch['EMD-1883'].thread.join()
+            ihm.metadata._prefetch_emdb_info('EMD-1883')
+        self.assertEqual(ihm.metadata._emdb_prefetch, {})
+
+    def test_mrc_parser_emdb_prefetch_stale(self):
+        """Test that stale EMDB metadata is used without waiting on
+           a prefetch"""
+        event = threading.Event()
+
+        def mock_urlopen(url, timeout=None):
+            event.wait()
+            return BytesIO(
+                b'{"admin": {"key_dates": {"map_release": "2012-01-01"},'
+                b'"title": "new details"}}')
+        with utils.temporary_directory() as tmpdir:
+            cache = os.path.join(tmpdir, 'emdb.json')
+            with open(cache, 'w') as fh:
+                json.dump({'EMD-1883': {'map_release': '2011-04-21',
+                                        'title': 'test details',
+                                        'fetched_at': 0.}}, fh)
+            ihm.metadata.set_emdb_cache(cache)
+            p = ihm.metadata.MRCParser(prefetch=True)
+            fname = utils.get_input_file_name(TOPDIR,
+                                              'emd_1883.map.mrc-header')
+            with _patch_urlopen(mock_urlopen):
+                try:
+                    d = p.parse_file(fname)
+                    # Prefetch is blocked, so stale data should be used
+                    self.assertEqual(d['dataset'].location.version,
+                                     '2011-04-21')
+                finally:
+                    event.set()
+                    ihm.metadata._emdb_prefetch['EMD-1883'].thread.join()
+            self.assertEqual(ihm.metadata._emdb_info_cache['EMD-1883'],
+                             ('2012-01-01', 'new details'))
+
+    def test_mrc_parser_emdb_prefetch_bad(self):
+        """Test MRCParser prefetching EMDB metadata, with a network error"""
+        mock_urlopen = _RecordingUrlopen(_bad_urlopen)
+        p = ihm.metadata.MRCParser(prefetch=True)
+        fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
+        with _patch_urlopen(mock_urlopen):
+            d = p.parse_file(fname)
+            with warnings.catch_warnings(record=True) as w:
+                warnings.simplefilter("always")
+                self.assertIsNone(d['dataset'].location.version)
+        # Failed prefetch should be reported when the metadata is needed,
+        # not retried
+        self.assertEqual(len(mock_urlopen.calls), 1)
+        self.assertEqual(len(w), 1)
+
+    def test_mrc_parser_emdb_prefetch_uncached(self):
+        """Test MRCParser using prefetched EMDB metadata without a cache"""
+        mock_urlopen = _RecordingUrlopen(_ok_urlopen)
+        p = ihm.metadata.MRCParser(prefetch=True)
+        fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
+        with _patch_urlopen(mock_urlopen):
+            d = p.parse_file(fname)
+            self.assertEqual(d['dataset'].location.version, '2011-04-21')
+        self.assertEqual(len(mock_urlopen.calls), 1)
+        self.assertEqual(len(ihm.metadata._emdb_info_cache), 0)
+
+    def test_mrc_parser_emdb_prefetch_incomplete(self):
+        """Test MRCParser prefetching incomplete EMDB metadata"""
+        def mock_urlopen(url, timeout=None):
+            return BytesIO(b'{"admin": {"title": "test details"}}')
+        p = ihm.metadata.MRCParser(prefetch=True)
+        fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
+        with _patch_urlopen(mock_urlopen):
+            d = p.parse_file(fname)
+            fetch = ihm.metadata._emdb_prefetch['EMD-1883']
+            # Error should be passed back from the background thread
+            self.assertRaises(KeyError, getattr, d['dataset'].location,
+                              'version')
+        self.assertIsInstance(fetch.error, KeyError)
+        self.assertEqual(ihm.metadata._emdb_prefetch, {})
 
     def test_mrc_parser_emdb_bad(self):
         """Test MRCParser pointing to an MRC in EMDB, with a network error"""
-        def mock_urlopen(url, timeout=None):
-            raise urlerror.URLError("Mock network error")
         p = ihm.metadata.MRCParser()
         fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
         d = p.parse_file(fname)
@@ -90,23 +293,206 @@ class Tests(unittest.TestCase):
         self.assertEqual(dataset.location.access_code, 'EMD-1883')
 
         # Mock out urllib.request to raise an error
-        try:
-            orig_urlopen = urlrequest.urlopen
-            urlrequest.urlopen = mock_urlopen
+        with _patch_urlopen(_bad_urlopen):
             with warnings.catch_warnings(record=True) as w:
                 warnings.simplefilter("always")
                 self.assertIsNone(dataset.location.version)
                 self.assertEqual(dataset.location.details,
                                  'Electron microscopy density map')
-        finally:
-            urlrequest.urlopen = orig_urlopen
         self.assertEqual(len(w), 1)
 
+    def test_mrc_parser_emdb_cache_hit(self):
+        """Test MRCParser using EMDB metadata from the disk cache"""
+        with utils.temporary_directory() as tmpdir:
+            cache = os.path.join(tmpdir, 'emdb.json')
+            with open(cache, 'w') as fh:
+                json.dump({'EMD-1883': {'map_release': '2011-04-21',
+                                        'title': 'test details',
+                                        'fetched_at': time.time()}}, fh)
+            ihm.metadata.set_emdb_cache(cache)
+            p = ihm.metadata.MRCParser()
+            fname = utils.get_input_file_name(TOPDIR,
+                                              'emd_1883.map.mrc-header')
+            d = p.parse_file(fname)
+            with _patch_urlopen(_bad_urlopen):
+                with warnings.catch_warnings(record=True) as w:
+                    warnings.simplefilter("always")
+                    loc = d['dataset'].location
+                    self.assertEqual(loc.version, '2011-04-21')
+                    self.assertEqual(loc.details, 'test details')
+            self.assertEqual(len(w), 0)
+
+    def test_mrc_parser_emdb_cache_miss(self):
+        """Test MRCParser populating the EMDB disk cache"""
+        with utils.temporary_directory() as tmpdir:
+            cache = os.path.join(tmpdir, 'subdir', 'emdb.json')
+            ihm.metadata.set_emdb_cache(cache)
+            p = ihm.metadata.MRCParser()
+            fname = utils.get_input_file_name(TOPDIR,
+                                              'emd_1883.map.mrc-header')
+            d = p.parse_file(fname)
+            with _patch_urlopen(_ok_urlopen):
+                self.assertEqual(d['dataset'].location.version, '2011-04-21')
+            with open(cache) as fh:
+                contents = json.load(fh)
+            self.assertEqual(list(contents.keys()), ['EMD-1883'])
+            self.assertEqual(contents['EMD-1883']['title'], 'test details')
+
+    def test_mrc_parser_emdb_cache_stale(self):
+        """Test MRCParser refreshing stale EMDB metadata"""
+        def mock_urlopen(url, timeout=None):
+            return BytesIO(
+                b'{"admin": {"key_dates": {"map_release": "2012-01-01"},'
+                b'"title": "new details"}}')
+        with utils.temporary_directory() as tmpdir:
+            cache = os.path.join(tmpdir, 'emdb.json')
+            with open(cache, 'w') as fh:
+                json.dump({'EMD-1883': {'map_release': '2011-04-21',
+                                        'title': 'test details',
+                                        'fetched_at': 0.}}, fh)
+            ihm.metadata.set_emdb_cache(cache)
+            p = ihm.metadata.MRCParser()
+            fname = utils.get_input_file_name(TOPDIR,
+                                              'emd_1883.map.mrc-header')
+            d = p.parse_file(fname)
+            with _patch_urlopen(mock_urlopen):
+                # Stale data should be returned immediately
+                self.assertEqual(d['dataset'].location.version, '2011-04-21')
+                # Wait for the background refresh to complete
+                for _ in range(100):
+                    info = ihm.metadata._emdb_info_cache['EMD-1883']
+                    if info[0] == '2012-01-01':
+                        break
+                    time.sleep(0.05)
+            self.assertEqual(info, ('2012-01-01', 'new details'))
+
+    def test_clear_emdb_cache(self):
+        """Test clear_emdb_cache"""
+        ihm.metadata.set_emdb_cache(persist=False)
+        mock_urlopen = _RecordingUrlopen(_ok_urlopen)
+        fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
+        with _patch_urlopen(mock_urlopen):
+            for i in range(2):
+                d = ihm.metadata.MRCParser().parse_file(fname)
+                self.assertEqual(d['dataset'].location.version, '2011-04-21')
+                ihm.metadata.clear_emdb_cache()
+                self.assertEqual(ihm.metadata._emdb_info_cache, {})
+        # Each lookup should have queried EMDB, since the cache was cleared
+        self.assertEqual(len(mock_urlopen.calls), 2)
+
+    def test_emdb_cache_size(self):
+        """Test that the in-memory EMDB cache does not grow without bound"""
+        ihm.metadata.set_emdb_cache(persist=False)
+        orig_size = ihm.metadata._EMDB_CACHE_SIZE
+        ihm.metadata._EMDB_CACHE_SIZE = 2
+        try:
+            for code in ('EMD-1', 'EMD-2', 'EMD-1', 'EMD-3'):
+                ihm.metadata._set_cached_emdb_info(code, ('v', code))
+        finally:
+            ihm.metadata._EMDB_CACHE_SIZE = orig_size
+        # EMD-1 was used most recently, so EMD-2 should have been evicted
+        self.assertEqual(sorted(ihm.metadata._emdb_info_cache.keys()),
+                         ['EMD-1', 'EMD-3'])
+        ihm.metadata.set_emdb_cache(False)
+        self.assertEqual(len(ihm.metadata._emdb_info_cache), 0)
+        ihm.metadata._set_cached_emdb_info('EMD-1', ('v', 'EMD-1'))
+        self.assertEqual(len(ihm.metadata._emdb_info_cache), 0)
+
+    def test_set_emdb_cache_default(self):
+        """Test set_emdb_cache with the default cache location"""
+        with utils.temporary_directory() as tmpdir:
+            orig_env = os.environ.get('XDG_CACHE_HOME')
+            os.environ['XDG_CACHE_HOME'] = tmpdir
+            try:
+                ihm.metadata.set_emdb_cache()
+            finally:
+                if orig_env is None:
+                    del os.environ['XDG_CACHE_HOME']
+                else:
+                    os.environ['XDG_CACHE_HOME'] = orig_env
+            self.assertEqual(ihm.metadata._emdb_disk_cache.filename,
+                             os.path.join(tmpdir, 'python-ihm', 'emdb.json'))
+            ihm.metadata.set_emdb_cache(False)
+            self.assertIsNone(ihm.metadata._emdb_disk_cache)
+
+    def test_parse_emdb_response_json(self):
+        """Test parsing of EMDB API response without ijson"""
+        orig_ijson = ihm.metadata.ijson
+        ihm.metadata.ijson = None
+        try:
+            r = ihm.metadata._parse_emdb_response(BytesIO(
+                b'{"admin": {"key_dates": {"map_release": "2011-04-21"},'
+                b'"title": "test details"}}'))
+        finally:
+            ihm.metadata.ijson = orig_ijson
+        self.assertEqual(r, ('2011-04-21', 'test details'))
+
+    @unittest.skipIf(ihm.metadata.ijson is None, "ijson not available")
+    def test_parse_emdb_response_stream(self):
+        """Test streaming parse of large EMDB API response"""
+        fh = BytesIO(
+            b'{"admin": {"key_dates": {"map_release": "2011-04-21"},'
+            b'"title": "test details"}, "structure_determination_list": ['
+            + b', '.join([b'"%d"' % i for i in range(200000)]) + b']}')
+        r = ihm.metadata._parse_emdb_response(fh)
+        self.assertEqual(r, ('2011-04-21', 'test details'))
+        # Most of the response should not have been read
+        self.assertLess(fh.tell(), len(fh.getvalue()) // 10)
+
+    def test_parse_emdb_response_incomplete(self):
+        """Test parsing of EMDB API response missing fields"""
+        orig_ijson = ihm.metadata.ijson
+        # Test both the json and (if available) ijson code paths
+        for ijson in set((None, orig_ijson)):
+            ihm.metadata.ijson = ijson
+            try:
+                for resp in (b'{"admin": {"title": "test details"}}',
+                             b'{"admin": {"key_dates": '
+                             b'{"map_release": "2011-04-21"}}}'):
+                    self.assertRaises(KeyError,
+                                      ihm.metadata._parse_emdb_response,
+                                      BytesIO(resp))
+            finally:
+                ihm.metadata.ijson = orig_ijson
+
+    def test_parse_emdb_response_malformed(self):
+        """Test parsing of malformed EMDB API response"""
+        orig_ijson = ihm.metadata.ijson
+        # Test both the json and (if available) ijson code paths
+        for ijson in set((None, orig_ijson)):
+            ihm.metadata.ijson = ijson
+            try:
+                for resp in (b'not json', b'{"admin": {"title": ',
+                             b'{"admin": {"title": "x",, }}'):
+                    self.assertRaises(ValueError,
+                                      ihm.metadata._parse_emdb_response,
+                                      BytesIO(resp))
+            finally:
+                ihm.metadata.ijson = orig_ijson
+
+    @unittest.skipIf(ihm.metadata.ijson is None, "ijson not available")
+    def test_parse_emdb_response_malformed_stream(self):
+        """Test streaming parse of malformed EMDB API response"""
+        with self.assertRaises(ValueError) as cm:
+            ihm.metadata._parse_emdb_response(BytesIO(b'{"admin": {'))
+        self.assertNotIsInstance(cm.exception, ihm.metadata.ijson.JSONError)
+        self.assertIsNone(getattr(cm.exception, '__context__', None))
+
+    def test_mrc_parser_emdb_incomplete(self):
+        """Test that incomplete EMDB metadata is not cached"""
+        def mock_urlopen(url, timeout=None):
+            return BytesIO(b'{"admin": {"title": "test details"}}')
+        p = ihm.metadata.MRCParser()
+        fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
+        d = p.parse_file(fname)
+        with _patch_urlopen(mock_urlopen):
+            self.assertRaises(KeyError, getattr, d['dataset'].location,
+                              'version')
+        self.assertNotIn('EMD-1883', ihm.metadata._emdb_info_cache)
+
     def test_mrc_parser_emdb_override(self):
         """Test MRCParser pointing to an MRC in EMDB with
            overridden metadata"""
-        def mock_urlopen(url, timeout=None):
-            raise ValueError("shouldn't be here")
         p = ihm.metadata.MRCParser()
         fname = utils.get_input_file_name(TOPDIR, 'emd_1883.map.mrc-header')
         d = p.parse_file(fname)
@@ -119,18 +505,67 @@ class Tests(unittest.TestCase):
         dataset.location.version = 'foo'
 
         # Mock out urllib.request to raise an error
-        try:
-            orig_urlopen = urlrequest.urlopen
-            urlrequest.urlopen = mock_urlopen
+        with _patch_urlopen(_raise_urlopen):
             self.assertEqual(dataset.location.version, 'foo')
             self.assertEqual(dataset.location.details,
                              'Electron microscopy density map')
-        finally:
-            urlrequest.urlopen = orig_urlopen
 
     def _parse_pdb(self, fname):
-        p = ihm.metadata.PDBParser()
-        return p.parse_file(fname)
+        return self._pdb_parser.parse_file(fname)
+
+    def test_parse_cache_disabled(self):
+        """Test that parsed metadata is not cached by default"""
+        self._parse_pdb(utils.get_input_file_name(TOPDIR, 'official.pdb'))
+        self.assertEqual(len(ihm.metadata._parse_cache), 0)
+
+    def test_parse_cache(self):
+        """Test caching of parsed metadata"""
+        ihm.metadata.set_parse_cache()
+        self.addCleanup(ihm.metadata.set_parse_cache, False)
+        with utils.temporary_directory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.pdb')
+            shutil.copy(utils.get_input_file_name(TOPDIR, 'official.pdb'),
+                        fname)
+            p1 = self._parse_pdb(fname)
+            p2 = self._parse_pdb(fname)
+            # Each call should get its own copy of the metadata
+            self.assertIsNot(p1['metadata'], p2['metadata'])
+            self.assertEqual(p1['metadata'][0].helix_id,
+                             p2['metadata'][0].helix_id)
+            self.assertEqual(len(ihm.metadata._parse_cache), 1)
+            # Modified file should be parsed again
+            with open(fname, 'w') as fh:
+                fh.write("REMARK\n")
+            p3 = self._parse_pdb(fname)
+            self.assertEqual(p3['metadata'], [])
+            self.assertEqual(len(ihm.metadata._parse_cache), 2)
+            ihm.metadata.clear_parse_cache()
+            self.assertEqual(len(ihm.metadata._parse_cache), 0)
+            self._parse_pdb(fname)
+            self.assertEqual(len(ihm.metadata._parse_cache), 1)
+            ihm.metadata.set_parse_cache(False)
+            self.assertEqual(len(ihm.metadata._parse_cache), 0)
+            self._parse_pdb(fname)
+            self.assertEqual(len(ihm.metadata._parse_cache), 0)
+
+    def test_parse_cache_size(self):
+        """Test that the parse cache does not grow without bound"""
+        ihm.metadata.set_parse_cache()
+        self.addCleanup(ihm.metadata.set_parse_cache, False)
+        orig_size = ihm.metadata._PARSE_CACHE_SIZE
+        ihm.metadata._PARSE_CACHE_SIZE = 2
+        try:
+            for fname in ('official.pdb', 'modeller_model.pdb',
+                          'official.pdb', 'derived_pdb.pdb'):
+                self._parse_pdb(utils.get_input_file_name(TOPDIR, fname))
+        finally:
+            ihm.metadata._PARSE_CACHE_SIZE = orig_size
+        # official.pdb was used most recently, so modeller_model.pdb
+        # should have been evicted
+        self.assertEqual(
+            sorted(os.path.basename(k[1])
+                   for k in ihm.metadata._parse_cache.keys()),
+            ['derived_pdb.pdb', 'official.pdb'])
 
     def test_official_pdb(self):
         """Test PDBParser when given an official PDB"""
@@ -185,6 +620,22 @@ class Tests(unittest.TestCase):
         self.assertEqual(dataset.location.details,
                          'Starting model structure')
 
+    def test_official_pdb_coordinates(self):
+        """Test PDBParser ignores records in the coordinate section"""
+        with open(utils.get_input_file_name(TOPDIR, 'official.pdb')) as fh:
+            header = [line for line in fh if not line.startswith('ATOM')]
+        with utils.temporary_directory() as tmpdir:
+            fname = os.path.join(tmpdir, 'test.pdb')
+            with open(fname, 'w') as fh:
+                fh.writelines(header)
+                fh.write('MODEL        1\n')
+                # Should not be parsed, since it follows the header
+                fh.write(header[-1])
+                fh.write('ATOM      1  N   ALA A   1      27.340  24.430'
+                         '   2.614  1.00  9.67           N\n')
+            p = self._parse_pdb(fname)
+        self.assertEqual(len(p['metadata']), 1)
+
     def test_derived_pdb(self):
         """Test PDBarser when given a file derived from a PDB"""
         pdbname = utils.get_input_file_name(TOPDIR, 'derived_pdb.pdb')
@@ -440,21 +891,46 @@ class Tests(unittest.TestCase):
         self.assertEqual(dataset.location.details,
                          'Starting model structure')
 
+    def test_coordinate_only_pdb(self):
+        """Test PDBParser when given a PDB file with no headers."""
+        with utils.temporary_directory() as tmpdir:
+            pdbname = os.path.join(tmpdir, 'test.pdb')
+            with open(pdbname, 'w') as fh:
+                fh.write('ATOM      1  N   ALA A   1      27.340  24.430'
+                         '   2.614  1.00  9.67           N\n')
+            p = self._parse_pdb(pdbname)
+        self.assertEqual(p['templates'], {})
+        self.assertEqual(p['software'], [])
+        self.assertIsNone(p['script'])
+        dataset = p['dataset']
+        self.assertEqual(dataset.data_type, 'Comparative model')
+        self.assertEqual(dataset.location.path, pdbname)
+
     def test_get_aligned_region_empty(self):
         """Test _get_aligned_region() with empty alignment"""
         self.assertRaises(ValueError, ihm.metadata._get_aligned_region,
                           'AAAA', '----')
 
+    def test_get_aligned_region(self):
+        """Test _get_aligned_region()"""
+        r = ihm.metadata._get_aligned_region('-AB-CDE-', 'XX-Y-ZWV')
+        self.assertEqual(r, ((1, 5), (2, 5)))
+        # Long alignment, with unaligned regions at each end
+        tgt = 'A' * 100 + '-' * 50 + 'A' * 100000 + 'A' * 20
+        tmpl = '-' * 100 + 'A' * 50 + 'A' * 100000 + '-' * 20
+        r = ihm.metadata._get_aligned_region(tgt, tmpl)
+        self.assertEqual(r, ((101, 100100), (51, 100050)))
+
     def _parse_cif(self, fname):
-        p = ihm.metadata.CIFParser()
-        return p.parse_file(fname)
+        return self._cif_parser.parse_file(fname)
 
     def test_cif_official_pdb(self):
         """Test CIFParser when given an mmCIF in the official PDB database"""
         p = self._parse_cif(utils.get_input_file_name(TOPDIR, 'official.cif'))
         self._check_parsed_official_pdb(p)
 
-    @unittest.skipIf(_format is None, "No C tokenizer")
+    @unittest.skipIf(_format is None and msgpack is None,
+                     "No C tokenizer or msgpack")
     def test_binary_cif_official_pdb(self):
         """Test BinaryCIFParser when given a BinaryCIF in the official PDB"""
         fname = utils.get_input_file_name(TOPDIR, 'official.bcif')
@@ -30,23 +30,15 @@ class Tests(unittest.TestCase):
         self.assertIsNone(m.name)
         self.assertEqual(m.protocol, 'bar')
 
-    def test_model_get_spheres(self):
-        """Test Model.get_spheres()"""
-        m = ihm.model.Model(assembly='foo', protocol='bar',
-                            representation='baz')
-        spheres = ['sphere1', 'sphere2']
-        m._spheres = spheres[:]
-        new_spheres = [s for s in m.get_spheres()]
-        self.assertEqual(new_spheres, spheres)
-
-    def test_model_add_sphere(self):
-        """Test Model.add_sphere()"""
+    def test_model_spheres(self):
+        """Test Model.add_sphere() and Model.get_spheres()"""
         spheres = ['sphere1', 'sphere2']
         m = ihm.model.Model(assembly='foo', protocol='bar',
                             representation='baz')
         m.add_sphere(spheres[0])
         m.add_sphere(spheres[1])
         self.assertEqual(m._spheres, spheres)
+        self.assertEqual(list(m.get_spheres()), spheres)
 
     def test_model_get_atoms(self):
         """Test Model.get_atoms()"""
@@ -7,16 +7,70 @@ utils.set_search_paths(TOPDIR)
 import ihm.multi_state_scheme
 
 
+EQ_OTHER = ('equilibrium constant is determined from another method '
+            'not listed')
+EQ_POP = 'equilibrium constant is determined from population'
+EQ_KAB = 'equilibrium constant is determined from kinetic rates, kAB/kBA'
+
+
+class MockObject(object):
+    pass
+
+
+def _make_states(num):
+    """Make `num` mock states, named s1, s2, ..."""
+    states = [MockObject() for _ in range(num)]
+    for i, s in enumerate(states):
+        s.name = 's%d' % (i + 1)
+    return states
+
+
 class Tests(unittest.TestCase):
 
+    @classmethod
+    def setUpClass(cls):
+        # Objects that are only compared (never added to a scheme, which
+        # would modify them) can be shared by all tests
+        s1, s2 = _make_states(2)
+        cls.mssc_kw = dict(begin_state=s1, end_state=s2,
+                           details='details1',
+                           dataset_group='dataset_group1',
+                           kinetic_rate='kinetic_rate1',
+                           relaxation_time='relaxation_time1')
+        cls.mssc_ref = ihm.multi_state_scheme.Connectivity(**cls.mssc_kw)
+        cls.e1 = ihm.multi_state_scheme.PopulationEquilibriumConstant(
+            value=1.5, unit='unit1')
+        cls.e2 = ihm.multi_state_scheme.KineticRateEquilibriumConstant(
+            value=1.5, unit='unit1')
+        cls.k_kw = dict(transition_rate_constant=1.0,
+                        equilibrium_constant=cls.e1, details='details1',
+                        dataset_group='dataset_group1', file='file1')
+        cls.k_ref = ihm.multi_state_scheme.KineticRate(**cls.k_kw)
+        cls.r_kw = dict(value=1.0, unit='milliseconds', details='details1',
+                        dataset_group='dataset_group1', file='file1')
+        cls.r_ref = ihm.multi_state_scheme.RelaxationTime(**cls.r_kw)
+
+    def setUp(self):
+        # States are added to schemes (via connectivities), so each test
+        # gets its own
+        self.s1, self.s2, self.s3, self.s4 = _make_states(4)
+
+    def _check_eq(self, cls, ref, ref_kw, changes):
+        """Check that ref equals an object built from the same keyword
+           arguments, but differs from objects with each of the given
+           (keyword, value) changes applied. Inequality is checked with
+           == rather than assertNotEqual, since these classes define no
+           __ne__ (so on Python 2, != would only compare identity)"""
+        equal = cls(**ref_kw)
+        self.assertEqual(ref, ref)
+        self.assertEqual(ref, equal)
+        for key, value in changes:
+            unequal = cls(**dict(ref_kw, **{key: value}))
+            self.assertFalse(ref == unequal, msg=key)
+
     def test_multistatescheme_init(self):
         """Test the initialization of MultiStateScheme"""
-        class MockObject(object):
-            pass
-        s1 = MockObject()
-        s2 = MockObject()
-        s1.name = 's1'
-        s2.name = 's2'
+        s1, s2 = self.s1, self.s2
         mssc1 = ihm.multi_state_scheme.Connectivity(
             begin_state=s1,
             end_state=s2)
@@ -86,50 +140,41 @@ class Tests(unittest.TestCase):
 
     def test_multistatescheme_add_connectivity(self):
         """Test addition of a connectivity to a MultiStateScheme"""
-        class MockObject(object):
-            pass
+        s1, s2, s3, s4 = states = [self.s1, self.s2, self.s3, self.s4]
         mss1 = ihm.multi_state_scheme.MultiStateScheme(name='n',
                                                        details='d')
         # The connectivity_list should be empty upon initialization
         self.assertEqual(len(mss1._connectivity_list), 0)
         # Add a connectivity should add it to the connectivity_list and the
         # states should be stored as well
-        s1 = MockObject()
-        s2 = MockObject()
-        s1.name = 's1'
-        s2.name = 's2'
         mssc1 = ihm.multi_state_scheme.Connectivity(
             begin_state=s1,
             end_state=s2)
         mss1.add_connectivity(mssc1)
         self.assertEqual(len(mss1._connectivity_list), 1)
         self.assertEqual(mss1._connectivity_list, [mssc1])
-        self.assertEqual(mss1._states, [s1, s2])
+        self.assertEqual(mss1._states, states[:2])
         # add a connectivity without end_state
-        s3 = MockObject()
-        s3.name = 's3'
         mssc2 = ihm.multi_state_scheme.Connectivity(
             begin_state=s3)
         mss1.add_connectivity(mssc2)
         self.assertEqual(len(mss1._connectivity_list), 2)
         self.assertEqual(mss1._connectivity_list, [mssc1,
                                                    mssc2])
-        self.assertEqual(mss1._states, [s1, s2, s3])
+        self.assertEqual(mss1._states, states[:3])
         # add a connectivity with a previously known state should not add it
         # to the states
-        s4 = MockObject()
-        s4.name = 's4'
         mssc3 = ihm.multi_state_scheme.Connectivity(
             begin_state=s2,
             end_state=s4)
         mss1.add_connectivity(mssc3)
         self.assertEqual(len(mss1._connectivity_list), 3)
         self.assertEqual(mss1._connectivity_list, [mssc1, mssc2, mssc3])
-        self.assertEqual(mss1._states, [s1, s2, s3, s4])
+        self.assertEqual(mss1._states, states)
         mss1.add_connectivity(None)
         self.assertEqual(len(mss1._connectivity_list), 3)
         self.assertEqual(mss1._connectivity_list, [mssc1, mssc2, mssc3])
-        self.assertEqual(mss1._states, [s1, s2, s3, s4])
+        self.assertEqual(mss1._states, states)
 
     def test_multistatescheme_add_relaxation_time(self):
         """Test addition of a relaxation time to a MultiStateScheme"""
@@ -142,16 +187,7 @@ class Tests(unittest.TestCase):
 
     def test_multistatesscheme_get_connectivities(self):
         """Test the return of connectivities from a MultiStateScheme"""
-        class MockObject(object):
-            pass
-        s1 = MockObject()
-        s2 = MockObject()
-        s3 = MockObject()
-        s4 = MockObject()
-        s1.name = 's1'
-        s2.name = 's2'
-        s3.name = 's3'
-        s4.name = 's4'
+        s1, s2, s3, s4 = self.s1, self.s2, self.s3, self.s4
         mssc1 = ihm.multi_state_scheme.Connectivity(
             begin_state=s1,
             end_state=s2)
@@ -166,10 +202,9 @@ class Tests(unittest.TestCase):
             connectivities=[mssc1, mssc2])
         self.assertEqual(mss1.get_connectivities(), [mssc1, mssc2])
         mss1.add_connectivity(mssc3)
-        # Test addition of the same connectivity multiple times
         self.assertEqual(mss1.get_connectivities(), [mssc1, mssc2, mssc3])
+        # Adding the same connectivities again should have no effect
         mss1.add_connectivity(mssc3)
-        self.assertEqual(mss1.get_connectivities(), [mssc1, mssc2, mssc3])
         mss1.add_connectivity(mssc1)
         self.assertEqual(mss1.get_connectivities(), [mssc1, mssc2, mssc3])
 
@@ -187,14 +222,7 @@ class Tests(unittest.TestCase):
 
     def test_multistatescheme_get_states(self):
         """Test the return of states from a MultiStateScheme"""
-        class MockObject(object):
-            pass
-        s1 = MockObject()
-        s2 = MockObject()
-        s3 = MockObject()
-        s1.name = 's1'
-        s2.name = 's2'
-        s3.name = 's3'
+        s1, s2, s3 = self.s1, self.s2, self.s3
         mssc1 = ihm.multi_state_scheme.Connectivity(
             begin_state=s1,
             end_state=s2)
@@ -215,16 +243,9 @@ class Tests(unittest.TestCase):
 
     def test_multistatescheme_eq(self):
         """Test equality of MultiStateScheme objects"""
-        class MockObject(object):
-            pass
-        s1 = MockObject()
-        s2 = MockObject()
-        s3 = MockObject()
-        s4 = MockObject()
-        s1.name = 's1'
-        s2.name = 's2'
-        s3.name = 's3'
-        s4.name = 's4'
+        s1, s2, s3, s4 = self.s1, self.s2, self.s3, self.s4
+        # Connectivities are modified when added to a scheme, so don't
+        # share them with other tests
         mssc1 = ihm.multi_state_scheme.Connectivity(
             begin_state=s1)
         mssc2 = ihm.multi_state_scheme.Connectivity(
@@ -261,24 +282,16 @@ class Tests(unittest.TestCase):
             connectivities=[mssc1],
             relaxation_times=['r1'])
 
-        self.assertTrue(mss_ref == mss_equal)
+        self.assertEqual(mss_ref, mss_ref)
+        self.assertEqual(mss_ref, mss_equal)
         self.assertFalse(mss_ref == mss_unequal)
-        self.assertTrue(mss_ref != mss_unequal)
         self.assertFalse(mss_ref == mss_unequal2)
-        self.assertTrue(mss_ref != mss_unequal2)
         self.assertFalse(mss_ref == mss_unequal4)
-        self.assertTrue(mss_ref != mss_unequal4)
         self.assertFalse(mss_ref == mss_unequal5)
-        self.assertTrue(mss_ref != mss_unequal5)
 
     def test_multistateschemeconnectivity_init(self):
         """Test initialization of Connectivity"""
-        class MockObject(object):
-            pass
-        s1 = MockObject()
-        s2 = MockObject()
-        s1.name = 's1'
-        s2.name = 's2'
+        s1, s2 = self.s1, self.s2
 
         mssc1 = ihm.multi_state_scheme.Connectivity(
             begin_state=s1,
@@ -296,50 +309,9 @@ class Tests(unittest.TestCase):
 
     def test_multistateschemeconnectivity_eq(self):
         """Test equality of Connectivity objects"""
-        class MockObject(object):
-            pass
-        s1 = MockObject()
-        s2 = MockObject()
-        s3 = MockObject()
-        s1.name = 's1'
-        s2.name = 's2'
-        s3.name = 's3'
-        mssc_ref = ihm.multi_state_scheme.Connectivity(
-            begin_state=s1,
-            end_state=s2,
-            details='details1',
-            dataset_group='dataset_group1',
-            kinetic_rate='kinetic_rate1',
-            relaxation_time='relaxation_time1')
-
-        mssc_equal = ihm.multi_state_scheme.Connectivity(
-            begin_state=s1,
-            end_state=s2,
-            details='details1',
-            dataset_group='dataset_group1',
-            kinetic_rate='kinetic_rate1',
-            relaxation_time='relaxation_time1')
-
-        mssc_unequal1 = ihm.multi_state_scheme.Connectivity(
-            begin_state=s1,
-            end_state=s3,
-            details='details1',
-            dataset_group='dataset_group1',
-            kinetic_rate='kinetic_rate1',
-            relaxation_time='relaxation_time1')
-
-        mssc_unequal2 = ihm.multi_state_scheme.Connectivity(
-            begin_state=s1,
-            details='details1',
-            dataset_group='dataset_group1',
-            kinetic_rate='kinetic_rate1',
-            relaxation_time='relaxation_time1')
-
-        self.assertTrue(mssc_ref == mssc_equal)
-        self.assertFalse(mssc_ref == mssc_unequal1)
-        self.assertTrue(mssc_ref != mssc_unequal1)
-        self.assertFalse(mssc_ref == mssc_unequal2)
-        self.assertTrue(mssc_ref != mssc_unequal2)
+        self._check_eq(ihm.multi_state_scheme.Connectivity,
+                       self.mssc_ref, self.mssc_kw,
+                       [('end_state', self.s3), ('end_state', None)])
 
     def test_equilibriumconstant_init(self):
         """Test initialization of EquilibriumConstant and the
@@ -349,19 +321,13 @@ class Tests(unittest.TestCase):
         self.assertIsInstance(e1, ihm.multi_state_scheme.EquilibriumConstant)
         self.assertEqual(e1.value, 1.0)
         self.assertEqual(e1.unit, 'a')
-        self.assertEqual(
-            e1.method,
-            'equilibrium constant is determined from another method '
-            'not listed')
+        self.assertEqual(e1.method, EQ_OTHER)
 
         e2 = ihm.multi_state_scheme.EquilibriumConstant(value=2.0)
         self.assertIsInstance(e2, ihm.multi_state_scheme.EquilibriumConstant)
         self.assertEqual(e2.value, 2.0)
         self.assertIsNone(e2.unit)
-        self.assertEqual(
-            e2.method,
-            'equilibrium constant is determined from another method '
-            'not listed')
+        self.assertEqual(e2.method, EQ_OTHER)
 
         e3 = ihm.multi_state_scheme.PopulationEquilibriumConstant(value=3.0,
                                                                   unit='b')
@@ -370,9 +336,7 @@ class Tests(unittest.TestCase):
             ihm.multi_state_scheme.PopulationEquilibriumConstant)
         self.assertEqual(e3.value, 3.0)
         self.assertEqual(e3.unit, 'b')
-        self.assertEqual(
-            e3.method,
-            'equilibrium constant is determined from population')
+        self.assertEqual(e3.method, EQ_POP)
 
         e4 = ihm.multi_state_scheme.KineticRateEquilibriumConstant(value=4.0,
                                                                    unit='c')
@@ -381,9 +345,7 @@ class Tests(unittest.TestCase):
             ihm.multi_state_scheme.KineticRateEquilibriumConstant)
         self.assertEqual(e4.value, 4.0)
         self.assertEqual(e4.unit, 'c')
-        self.assertEqual(
-            e4.method,
-            'equilibrium constant is determined from kinetic rates, kAB/kBA')
+        self.assertEqual(e4.method, EQ_KAB)
 
     def test_equilibrium_constant_eq(self):
         """Test equality of EquilibriumConstant objects"""
@@ -407,7 +369,7 @@ class Tests(unittest.TestCase):
         eq_unequal5 = ihm.multi_state_scheme.KineticRateEquilibriumConstant(
             value='1.0',
             unit='a')
-        self.assertTrue(e_ref1 == e_equal1)
+        self.assertEqual(e_ref1, e_equal1)
         self.assertFalse(e_ref1 == eq_unequal1)
         self.assertFalse(e_ref1 == eq_unequal2)
         self.assertFalse(e_ref1 == eq_unequal3)
@@ -429,7 +391,7 @@ class Tests(unittest.TestCase):
         e_unequal8 = ihm.multi_state_scheme.KineticRateEquilibriumConstant(
             value='1.0',
             unit='a')
-        self.assertTrue(e_ref2 == e_equal2)
+        self.assertEqual(e_ref2, e_equal2)
         self.assertFalse(e_ref2 == e_unequal6)
         self.assertFalse(e_ref2 == e_unequal7)
         self.assertFalse(e_ref2 == e_unequal8)
@@ -446,7 +408,7 @@ class Tests(unittest.TestCase):
         e_unequal10 = ihm.multi_state_scheme.EquilibriumConstant(
             value='1.0',
             unit='a')
-        self.assertTrue(e_ref3 == e_equal3)
+        self.assertEqual(e_ref3, e_equal3)
         self.assertFalse(e_ref3 == e_unequal9)
         self.assertFalse(e_ref3 == e_unequal10)
 
@@ -462,8 +424,7 @@ class Tests(unittest.TestCase):
             equilibrium_constant=e1)
         self.assertEqual(k2.equilibrium_constant.value, 1.0)
         self.assertEqual(k2.equilibrium_constant.unit, "unit")
-        self.assertEqual(k2.equilibrium_constant.method,
-                         'equilibrium constant is determined from population')
+        self.assertEqual(k2.equilibrium_constant.method, EQ_POP)
         # Initialization with all values given
         k3 = ihm.multi_state_scheme.KineticRate(
             transition_rate_constant=0.5,
@@ -474,59 +435,18 @@ class Tests(unittest.TestCase):
         self.assertEqual(k3.transition_rate_constant, 0.5)
         self.assertEqual(k3.equilibrium_constant.value, 1.0)
         self.assertEqual(k3.equilibrium_constant.unit, "unit")
-        self.assertEqual(k3.equilibrium_constant.method,
-                         'equilibrium constant is determined from population')
+        self.assertEqual(k3.equilibrium_constant.method, EQ_POP)
         self.assertEqual(k3.details, "details1")
         self.assertEqual(k3.dataset_group, 'dataset_group1')
         self.assertEqual(k3.external_file, 'file1')
 
     def test_kineticrate_eq(self):
         """Test equality of KineticRate objects"""
-        e1 = ihm.multi_state_scheme.PopulationEquilibriumConstant(
-            value=1.5, unit='unit1')
-        e2 = ihm.multi_state_scheme.KineticRateEquilibriumConstant(
-            value=1.5, unit='unit1')
-        k_ref = ihm.multi_state_scheme.KineticRate(
-            transition_rate_constant=1.0,
-            equilibrium_constant=e1,
-            details="details1",
-            dataset_group="dataset_group1",
-            file="file1"
-        )
-        k_equal = ihm.multi_state_scheme.KineticRate(
-            transition_rate_constant=1.0,
-            equilibrium_constant=e1,
-            details="details1",
-            dataset_group="dataset_group1",
-            file="file1"
-        )
-        k_unequal1 = ihm.multi_state_scheme.KineticRate(
-            transition_rate_constant=2.0,
-            equilibrium_constant=e1,
-            details="details1",
-            dataset_group="dataset_group1",
-            file="file1"
-        )
-        k_unequal2 = ihm.multi_state_scheme.KineticRate(
-            transition_rate_constant=1.0,
-            equilibrium_constant=e2,
-            details="details1",
-            dataset_group="dataset_group1",
-            file="file1"
-        )
-        k_unequal3 = ihm.multi_state_scheme.KineticRate(
-            transition_rate_constant=1.0,
-            details="details1",
-            dataset_group="dataset_group1",
-            file="file1"
-        )
-        self.assertTrue(k_ref == k_equal)
-        self.assertFalse(k_ref == k_unequal1)
-        self.assertTrue(k_ref != k_unequal1)
-        self.assertFalse(k_ref == k_unequal2)
-        self.assertTrue(k_ref != k_unequal2)
-        self.assertFalse(k_ref == k_unequal3)
-        self.assertTrue(k_ref != k_unequal3)
+        self._check_eq(ihm.multi_state_scheme.KineticRate,
+                       self.k_ref, self.k_kw,
+                       [('transition_rate_constant', 2.0),
+                        ('equilibrium_constant', self.e2),
+                        ('equilibrium_constant', None)])
 
     def test_relaxationtime_init(self):
         """Test initialization of RelaxationTime"""
@@ -551,65 +471,12 @@ class Tests(unittest.TestCase):
 
     def test_relaxationtime_eq(self):
         """Test equality of RelaxationTime objects"""
-        r_ref = ihm.multi_state_scheme.RelaxationTime(
-            value=1.0,
-            unit='milliseconds',
-            details='details1',
-            dataset_group='dataset_group1',
-            file='file1'
-        )
-        r_equal = ihm.multi_state_scheme.RelaxationTime(
-            value=1.0,
-            unit='milliseconds',
-            details='details1',
-            dataset_group='dataset_group1',
-            file='file1'
-        )
-        r_unequal1 = ihm.multi_state_scheme.RelaxationTime(
-            value=2.0,
-            unit='milliseconds',
-            details='details1',
-            dataset_group='dataset_group1',
-            file='file1'
-        )
-        r_unequal2 = ihm.multi_state_scheme.RelaxationTime(
-            value=1.0,
-            unit='seconds',
-            details='details1',
-            dataset_group='dataset_group1',
-            file='file1'
-        )
-        r_unequal3 = ihm.multi_state_scheme.RelaxationTime(
-            value=1.0,
-            unit='milliseconds',
-            details='details2',
-            dataset_group='dataset_group1',
-            file='file1'
-        )
-        r_unequal4 = ihm.multi_state_scheme.RelaxationTime(
-            value=1.0,
-            unit='milliseconds',
-            details='details',
-            dataset_group='dataset_group2',
-            file='file1'
-        )
-        r_unequal5 = ihm.multi_state_scheme.RelaxationTime(
-            value=1.0,
-            unit='milliseconds',
-            details='details1',
-            file='file1'
-        )
-        self.assertTrue(r_ref == r_equal)
-        self.assertFalse(r_ref == r_unequal1)
-        self.assertTrue(r_ref != r_unequal1)
-        self.assertFalse(r_ref == r_unequal2)
-        self.assertTrue(r_ref != r_unequal2)
-        self.assertFalse(r_ref == r_unequal3)
-        self.assertTrue(r_ref != r_unequal3)
-        self.assertFalse(r_ref == r_unequal4)
-        self.assertTrue(r_ref != r_unequal4)
-        self.assertFalse(r_ref == r_unequal5)
-        self.assertTrue(r_ref != r_unequal5)
+        self._check_eq(ihm.multi_state_scheme.RelaxationTime,
+                       self.r_ref, self.r_kw,
+                       [('value', 2.0), ('unit', 'seconds'),
+                        ('details', 'details2'),
+                        ('dataset_group', 'dataset_group2'),
+                        ('dataset_group', None)])
 
 
 if __name__ == '__main__':
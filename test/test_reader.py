@@ -151,7 +151,7 @@ class Tests(unittest.TestCase):
         im = ihm.reader.IDMapper(testlist, MockObject, '1', y='2')
         a = im.get_by_id('ID1')
         b = im.get_by_id('ID1')
-        self.assertEqual(id(a), id(b))
+        self.assertIs(a, b)
         self.assertEqual(a.x, '1')
         self.assertEqual(a.y, '2')
         self.assertEqual(testlist, [a])
@@ -459,9 +459,9 @@ _entity_poly_seq.hetero
                 s = e1.sequence
                 self.assertEqual(len(s), 5)
                 lpeptide = ihm.LPeptideAlphabet()
-                self.assertEqual(id(s[0]), id(lpeptide['M']))
-                self.assertEqual(id(s[1]), id(lpeptide['M']))
-                self.assertEqual(id(s[4]), id(lpeptide['C']))
+                self.assertIs(s[0], lpeptide['M'])
+                self.assertIs(s[1], lpeptide['M'])
+                self.assertIs(s[4], lpeptide['C'])
                 self.assertEqual(s[0].name, 'METHIONINE')
                 self.assertIsNone(s[2])
                 self.assertEqual(s[3].id, 'MYTYPE')
@@ -855,7 +855,7 @@ B 1 Nup85
             self.assertEqual(a2._id, 'B')
             self.assertEqual(a2.id, 'B')
             self.assertEqual(a2.details, 'Nup85')
-            self.assertEqual(id(a1.entity), id(a2.entity))
+            self.assertIs(a1.entity, a2.entity)
 
     def test_assembly_handler(self):
         """Test AssemblyHandler"""
@@ -3462,6 +3462,14 @@ _ihm_ordered_ensemble.model_group_id_end
             s, = ihm.reader.read(f, format='BCIF')
         self._check_pdbx(s)
 
+    @unittest.skipIf(_format is None, "No C tokenizer")
+    def test_read_full_pdbx_bcif_threaded(self):
+        """Test reading a full PDBx file in BinaryCIF format with threads"""
+        fname = utils.get_input_file_name(TOPDIR, '6ep0.bcif.gz')
+        with gzip.open(fname, 'rb') as f:
+            s, = ihm.reader.read(f, format='BCIF', num_threads=4)
+        self._check_pdbx(s)
+
     def test_old_file_read_default(self):
         """Test default handling of old files"""
         cif = """
@@ -49,7 +49,7 @@ class Tests(unittest.TestCase):
         a1, = s._get_alignments()
         a1a, = s._get_alignments()
         # should get same default alignment each time (get cache 2nd time)
-        self.assertEqual(id(a1), id(a1a))
+        self.assertIs(a1, a1a)
         self.assertEqual(a1.db_begin, 1)
         self.assertIsNone(a1.db_end)
         self.assertEqual(a1.entity_begin, 1)
@@ -22,6 +22,14 @@ import ihm.model
 
 
 class Tests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Reporting does not modify the citation, so share it between tests
+        cls.citation = ihm.Citation(
+            pmid="foo", title="bar", journal="j", volume=1,
+            page_range=(10, 20), year=2023, authors=["foo", "bar"],
+            doi="test")
+
     def test_report(self):
         """Test System.report()"""
         sio = StringIO()
@@ -83,10 +91,7 @@ class Tests(unittest.TestCase):
         """Test report_citations"""
         sio = StringIO()
         s = ihm.System(title='test system')
-        c = ihm.Citation(pmid="foo", title="bar", journal="j", volume=1,
-                         page_range=(10, 20), year=2023,
-                         authors=["foo", "bar"], doi="test")
-        s.citations.append(c)
+        s.citations.append(self.citation)
         r = ihm.report.Reporter(s, sio)
         r.report_citations()
 
@@ -100,10 +105,7 @@ class Tests(unittest.TestCase):
         r = ihm.report.Reporter(s, sio)
         # Should warn about missing citation
         self.assertWarns(ihm.report.MissingDataWarning, r.report_software)
-        c = ihm.Citation(pmid="foo", title="bar", journal="j", volume=1,
-                         page_range=(10, 20), year=2023,
-                         authors=["foo", "bar"], doi="test")
-        soft.citation = c
+        soft.citation = self.citation
         soft.version = None
         r.report_software()
 
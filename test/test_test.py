@@ -1,19 +1,21 @@
 import utils
 import os
-import sys
 import unittest
-import subprocess
 
 TOPDIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 utils.set_search_paths(TOPDIR)
-import ihm.test  # noqa: F401   # Test should also be importable
+import ihm.test
 
 
 class Tests(unittest.TestCase):
     def test_simple(self):
         """Exercise the ihm.test basic install test"""
-        subprocess.check_call([sys.executable,
-                               os.path.join(TOPDIR, 'ihm', 'test.py')])
+        # Run in this process rather than starting a new Python interpreter
+        suite = unittest.TestLoader().loadTestsFromTestCase(ihm.test.Tests)
+        result = unittest.TestResult()
+        suite.run(result)
+        self.assertEqual(result.testsRun, 1)
+        self.assertTrue(result.wasSuccessful())
 
 
 if __name__ == '__main__':
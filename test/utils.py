@@ -14,9 +14,15 @@ if not hasattr(unittest.TestCase, 'assertWarns'):
 
 
 def set_search_paths(topdir):
-    """Set search paths so that we can import Python modules"""
-    os.environ['PYTHONPATH'] = topdir + os.pathsep \
-        + os.environ.get('PYTHONPATH', '')
+    """Set search paths so that we can import Python modules.
+       Every test module calls this, so move topdir to the front of the
+       paths rather than adding it again (otherwise the paths would grow
+       with each module)."""
+    pythonpath = [p for p in os.environ.get('PYTHONPATH', '').split(os.pathsep)
+                  if p != topdir]
+    os.environ['PYTHONPATH'] = os.pathsep.join([topdir] + pythonpath)
+    if topdir in sys.path:
+        sys.path.remove(topdir)
     sys.path.insert(0, topdir)
 
 
@@ -28,8 +34,10 @@ def get_input_file_name(topdir, fname):
 @contextlib.contextmanager
 def temporary_directory(dir=None):
     _tmpdir = tempfile.mkdtemp(dir=dir)
-    yield _tmpdir
-    shutil.rmtree(_tmpdir, ignore_errors=True)
+    try:
+        yield _tmpdir
+    finally:
+        shutil.rmtree(_tmpdir, ignore_errors=True)
 
 
 if 'coverage' in sys.modules:
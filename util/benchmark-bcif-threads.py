@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+
+"""Time reading a BinaryCIF file with different numbers of decoding threads.
+
+   Usage: benchmark-bcif-threads.py file.bcif[.gz] [max_threads [repeats]]
+
+   Each thread count is tried `repeats` times and the fastest time reported.
+   Only the C-accelerated reader supports threads, and threads are only
+   used for categories with a large amount of data, so a speedup is only
+   expected for large files on multi-core machines.
+"""
+
+import sys
+import os
+import gzip
+import time
+import io
+import ihm.reader
+import ihm.format_bcif
+
+
+def read_file(data, num_threads):
+    start = time.perf_counter()
+    ihm.reader.read(io.BytesIO(data), format='BCIF', num_threads=num_threads)
+    return time.perf_counter() - start
+
+
+def main():
+    fname = sys.argv[1]
+    max_threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    opener = gzip.open if fname.endswith('.gz') else open
+    with opener(fname, 'rb') as fh:
+        data = fh.read()
+    if ihm.format_bcif._format is None:
+        print("Warning: C extension not available; threads will not be used")
+    print("%s: %d bytes, %d CPUs" % (fname, len(data), os.cpu_count()))
+    serial = None
+    for num_threads in range(1, max_threads + 1):
+        t = min(read_file(data, num_threads) for _ in range(repeats))
+        if serial is None:
+            serial = t
+        print("num_threads=%d: %.3f s (speedup %.2fx)"
+              % (num_threads, t, serial / t))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,20 +2,44 @@ import unittest
 import ihm.reader
 import ihm.dumper
 import urllib.request
+import concurrent.futures
+import io
 import os
 
 
+# PDB-IHM entries checked by the tests below
+PDB_IDS = ('9a0e', '8zzd', '9a82', '9a13', '9a0t')
+
+
+def _download(pdb_id):
+    url = 'https://pdb-ihm.org/cif/%s.cif' % pdb_id
+    with urllib.request.urlopen(url) as fh:
+        return fh.read()
+
+
 class Tests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Start all downloads in parallel; each test waits only for its
+        # own entry (and sees any download error itself)
+        cls._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=len(PDB_IDS))
+        cls._downloads = {pdb_id: cls._executor.submit(_download, pdb_id)
+                          for pdb_id in PDB_IDS}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._executor.shutdown(wait=False)
+
     def _read_cif(self, pdb_id):
-        url = 'https://pdb-ihm.org/cif/%s.cif' % pdb_id
-        with urllib.request.urlopen(url) as fh:
-            s, = ihm.reader.read(fh)
+        data = self._downloads[pdb_id].result()
+        s, = ihm.reader.read(io.BytesIO(data))
         return s
 
     def _write_cif(self, s, check=True):
-        with open('test.cif', 'w') as fh:
+        # Output is not inspected, so discard it
+        with open(os.devnull, 'w') as fh:
             ihm.dumper.write(fh, [s], check=check)
-        os.unlink('test.cif')
 
     def test_9a0e(self):
         """Test IMP structure with incorrect reference sequence (9a0e)"""